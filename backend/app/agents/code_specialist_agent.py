@@ -4,15 +4,275 @@ Generates complete project structures with proper organization
 Like v0.dev, Cursor AI, and Copilot
 """
 
-import os
+import hashlib
 import re
-from typing import Dict, Any, List, Optional
+import sys
+from functools import lru_cache
+from typing import Dict, Any, Callable, List, Optional, Tuple
+import orjson
+from cachetools import TTLCache
 from loguru import logger
 import google.generativeai as genai
 
+from app.core.gemini import configure_genai
 # Import memory service
 from app.services.memory_service import memory_service
 
+# Lines that close the FILES: section of the multi-file output format
+_SECTION_END_MARKERS = ('STRUCTURE:', 'SETUP:', 'RUN:')
+
+# `--- path ---` header lines inside the FILES: section
+_FILE_HEADER_RE = re.compile(r'^[ \t]*---[ \t]*([^\n]+?)[ \t]*---[ \t]*\r?$', re.MULTILINE)
+
+# Filenames that mark a project's entry point
+_MAIN_CANDIDATES = ('app.py', 'main.py', 'index.js', 'app.js', 'server.js')
+
+# Dependency manifests that carry the framework signal for project detection
+_PYTHON_MANIFESTS = ('requirements.txt', 'pyproject.toml', 'Pipfile')
+_CONFIG_FILES = frozenset(_PYTHON_MANIFESTS + ('package.json',))
+
+# First-iteration generations request several candidates in one call and
+# keep the first one that parses into files, instead of paying a full
+# fix round-trip when a single sample comes back malformed.
+_FIRST_ITERATION_CANDIDATES = 3
+
+# First-iteration results keyed by a hash of the normalized request and its
+# memory context, so repeated requests skip the model call. Entries are only
+# added through remember_success() once the project has run successfully.
+_RESPONSE_CACHE: TTLCache = TTLCache(maxsize=256, ttl=3600)
+
+# Static instructions sent as the model's system instruction. Every request
+# then starts with the same prefix, which Gemini's prompt caching can reuse,
+# and only the per-request context and description are sent as content.
+_GENERATION_INSTRUCTIONS = """You are an expert software engineer.
+
+CRITICAL INSTRUCTIONS:
+1. Generate a COMPLETE project with PROPER FOLDER STRUCTURE
+2. Create MULTIPLE files, not a single monolithic file
+3. Follow best practices for the technology stack
+4. Include ALL necessary configuration files
+5. Make it READY TO RUN - no placeholders or TODOs
+
+OUTPUT FORMAT (STRICTLY FOLLOW):
+
+PROJECT_TYPE: ...
+PROJECT_NAME: ...
+DESCRIPTION: ...
+
+FILES:
+--- path/to/file ---
+[Complete file content]
+
+STRUCTURE:
+[ASCII tree]
+
+SETUP:
+[Install command]
+
+RUN:
+[Start command]
+
+PORT:
+[Port number or NONE]
+"""
+
+# Static tails of the per-request prompts, kept out of the f-strings so only
+# the context, description and error are interpolated per call
+_GENERATION_PROMPT_TAIL = "\nNOW GENERATE THE COMPLETE PROJECT.\n"
+_FIX_PROMPT_HEAD = "\nYou are debugging a failed project.\n\n"
+_FIX_PROMPT_TAIL = """
+Fix ALL issues and return the COMPLETE corrected project
+using the EXACT same multi-file format.
+Ensure it runs without errors.
+"""
+
+
+def _package_json_dependencies(package_json: str) -> Any:
+    """
+    Dependency names declared in package.json. Falls back to the lowercased
+    raw text (substring checks) when the generated file isn't valid JSON.
+    """
+    try:
+        data = orjson.loads(package_json)
+    except orjson.JSONDecodeError:
+        return package_json.lower()
+
+    if not isinstance(data, dict):
+        return {}
+    deps = {}
+    for key in ('dependencies', 'devDependencies'):
+        section = data.get(key)
+        if isinstance(section, dict):
+            deps.update(section)
+    return deps
+
+
+@lru_cache(maxsize=64)
+def _detect_project_config_cached(config_items: Tuple[Tuple[str, str], ...]) -> Dict[str, Any]:
+    """
+    Detect project type from (filename, content) pairs of the manifest files.
+    Cached because fix iterations usually regenerate identical manifests.
+    """
+    configs = {name: content.lower() for name, content in config_items}
+
+    if 'package.json' in configs:
+        deps = _package_json_dependencies(dict(config_items)['package.json'])
+
+        if 'react' in deps:
+            return {
+                "project_type": "react",
+                "language": "javascript",
+                "is_server": True,
+                "start_command": "npm start",
+                "install_command": "npm install",
+                "port": 5555,
+                "dependencies": ["react", "react-dom"]
+            }
+
+        if 'express' in deps:
+            return {
+                "project_type": "express",
+                "language": "javascript",
+                "is_server": True,
+                "start_command": "node index.js",
+                "install_command": "npm install",
+                "port": 5555,
+                "dependencies": ["express"]
+            }
+
+    python_configs = [configs[name] for name in _PYTHON_MANIFESTS if name in configs]
+    if not python_configs:
+        # No manifest: the caller passed the Python sources instead
+        python_configs = [
+            content for name, content in configs.items()
+            if name.endswith('.py')
+        ]
+
+    has_flask = has_fastapi = False
+    for content in python_configs:
+        has_flask = has_flask or 'flask' in content
+        has_fastapi = has_fastapi or 'fastapi' in content
+        if has_flask:
+            break
+
+    if has_flask:
+        return {
+            "project_type": "flask",
+            "language": "python",
+            "is_server": True,
+            "start_command": "python app.py",
+            "install_command": "pip install -r requirements.txt",
+            "port": 5000,
+            "dependencies": ["flask"]
+        }
+
+    if has_fastapi:
+        return {
+            "project_type": "fastapi",
+            "language": "python",
+            "is_server": True,
+            "start_command": "uvicorn main:app --port 8100",
+            "install_command": "pip install -r requirements.txt",
+            "port": 8100,
+            "dependencies": ["fastapi", "uvicorn"]
+        }
+
+    return {
+        "project_type": "unknown",
+        "language": "unknown",
+        "is_server": False,
+        "start_command": None,
+        "install_command": None,
+        "port": None,
+        "dependencies": []
+    }
+
+
+
+@lru_cache(maxsize=1)
+def _get_model() -> genai.GenerativeModel:
+    """
+    Shared Gemini model, so fix iterations and repeat agent instances
+    reuse the same client instead of building a new one per request.
+    """
+    configure_genai()
+    return genai.GenerativeModel(
+        'gemini-2.5-flash',
+        system_instruction=_GENERATION_INSTRUCTIONS
+    )
+
+
+class _MultiFileStreamParser:
+    """
+    Incremental parser for the FILES: section of the multi-file format.
+
+    Text can be fed in arbitrary chunks (e.g. straight from a streaming
+    response). Each `--- path ---` header line starts a new file, and a file
+    is complete once the next header or the end of the section is seen.
+    """
+
+    def __init__(self):
+        self.files: Dict[str, str] = {}
+        self._pending = ""
+        self._in_files = False
+        self._done = False
+        self._current_file: Optional[str] = None
+        self._buffer: List[str] = []
+
+    def feed(self, text: str) -> List[str]:
+        """Consume a chunk of text, returning the paths it completed"""
+        if self._done:
+            return []
+        lines = (self._pending + text).split('\n')
+        self._pending = lines.pop()
+        return self._consume(lines)
+
+    def close(self) -> List[str]:
+        """Flush the trailing partial line and the last open file"""
+        if self._done:
+            return []
+        completed = self._consume([self._pending])
+        self._pending = ""
+        completed.extend(self._flush())
+        self._done = True
+        return completed
+
+    def _consume(self, lines: List[str]) -> List[str]:
+        completed = []
+        for line in lines:
+            if not self._in_files:
+                # Skip everything until the FILES: sentinel
+                if 'FILES:' in line.upper():
+                    self._in_files = True
+                continue
+
+            if line.startswith(_SECTION_END_MARKERS):
+                completed.extend(self._flush())
+                self._done = True
+                break
+
+            stripped = line.strip()
+            if stripped.startswith('---') and stripped.endswith('---'):
+                filepath = stripped[3:-3].strip()
+                if filepath.strip('-'):
+                    completed.extend(self._flush())
+                    self._current_file = sys.intern(filepath.replace('\\', '/'))
+                    continue
+
+            if self._current_file is not None:
+                self._buffer.append(line)
+
+        return completed
+
+    def _flush(self) -> List[str]:
+        if self._current_file is None:
+            return []
+        filepath = self._current_file
+        self.files[filepath] = '\n'.join(self._buffer).strip()
+        self._current_file = None
+        self._buffer = []
+        return [filepath]
+
 
 class CodeSpecialistAgent:
     """
@@ -23,14 +283,11 @@ class CodeSpecialistAgent:
 
     def __init__(self):
         """Initialize code specialist with Gemini Pro"""
-        api_key = os.getenv("GOOGLE_API_KEY", "")
-        if not api_key:
+        if not configure_genai():
             logger.warning("⚠️ GOOGLE_API_KEY not set")
 
-        genai.configure(api_key=api_key)
-
         # ✅ KEEPING YOUR ORIGINAL MODEL (no downgrade)
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+        self.model = _get_model()
 
         logger.info("✅ Code Specialist initialized with Gemini Pro + Memory")
 
@@ -41,11 +298,15 @@ class CodeSpecialistAgent:
         conversation_history: list = None,
         iteration: int = 1,
         previous_error: str = None,
-        context: str = None
+        context: str = None,
+        message_callback: Optional[Callable] = None
     ) -> Dict[str, Any]:
         """
         Generate complete project with proper structure
         WITH MEMORY CONTEXT
+
+        When message_callback is given the response is streamed and a
+        "file_ready" update is sent as soon as each file is complete.
         """
 
         # ============================================================
@@ -90,13 +351,38 @@ class CodeSpecialistAgent:
         else:
             prompt = self._create_fix_prompt(description, previous_error, memory_context)
 
+        cache_key = None
+        if iteration == 1 and not previous_error:
+            cache_key = hashlib.sha256(
+                f"{description.strip().lower()}\0{memory_context}".encode()
+            ).hexdigest()
+            cached = _RESPONSE_CACHE.get(cache_key)
+            if cached is not None:
+                logger.info("⚡ Reusing cached generation")
+                if message_callback:
+                    await self._notify_files(message_callback, list(cached["files"]))
+                return {**cached, "files": dict(cached["files"])}
+
         try:
             logger.info(f"🎨 Generating code (iteration {iteration})...")
-            response = self.model.generate_content(prompt)
-            code_output = response.text.strip()
-
-            # Parse multi-file output
-            parse_result = self._parse_multi_file_output(code_output)
+            if message_callback:
+                code_output, parse_result = await self._stream_generation(
+                    prompt, message_callback
+                )
+            elif iteration == 1:
+                response = await self.model.generate_content_async(
+                    prompt,
+                    generation_config=genai.GenerationConfig(
+                        candidate_count=_FIRST_ITERATION_CANDIDATES
+                    )
+                )
+                code_output, parse_result = self._pick_candidate(response)
+            else:
+                response = await self.model.generate_content_async(prompt)
+                code_output = response.text.strip()
+
+                # Parse multi-file output
+                parse_result = self._parse_multi_file_output(code_output)
 
             if not parse_result["files"]:
                 logger.warning("⚠️ Multi-file parsing failed, treating as single file")
@@ -117,7 +403,7 @@ class CodeSpecialistAgent:
             logger.info(f"📦 Project type: {project_config['project_type']}")
             logger.info(f"📁 Project name: {project_name}")
 
-            return {
+            result = {
                 "success": True,
                 "files": parse_result["files"],
                 "structure": parse_result["structure"],
@@ -133,6 +419,11 @@ class CodeSpecialistAgent:
                 "raw_output": code_output
             }
 
+            if cache_key:
+                result["cache_key"] = cache_key
+
+            return result
+
         except Exception as e:
             logger.error(f"❌ Code generation error: {str(e)}")
             return {
@@ -142,6 +433,15 @@ class CodeSpecialistAgent:
                 "raw_output": ""
             }
 
+    def remember_success(self, result: Dict[str, Any]):
+        """
+        Cache a generation result once its project has executed successfully,
+        so a broken project is never replayed for a repeated request.
+        """
+        cache_key = result.get("cache_key")
+        if cache_key and result.get("success"):
+            _RESPONSE_CACHE[cache_key] = {**result, "files": dict(result["files"])}
+
     # ============================================================
     # PROMPT CREATION (UPDATED TO ACCEPT MEMORY CONTEXT)
     # ============================================================
@@ -149,44 +449,7 @@ class CodeSpecialistAgent:
     def _create_generation_prompt(self, description: str, context: Optional[str]) -> str:
         """Create prompt for initial code generation with memory"""
 
-        return f"""
-You are an expert software engineer.
-
-{context if context else ""}
-
-User Request: "{description}"
-
-CRITICAL INSTRUCTIONS:
-1. Generate a COMPLETE project with PROPER FOLDER STRUCTURE
-2. Create MULTIPLE files, not a single monolithic file
-3. Follow best practices for the technology stack
-4. Include ALL necessary configuration files
-5. Make it READY TO RUN - no placeholders or TODOs
-
-OUTPUT FORMAT (STRICTLY FOLLOW):
-
-PROJECT_TYPE: ...
-PROJECT_NAME: ...
-DESCRIPTION: ...
-
-FILES:
---- path/to/file ---
-[Complete file content]
-
-STRUCTURE:
-[ASCII tree]
-
-SETUP:
-[Install command]
-
-RUN:
-[Start command]
-
-PORT:
-[Port number or NONE]
-
-NOW GENERATE THE COMPLETE PROJECT.
-"""
+        return f'\n{context or ""}\n\nUser Request: "{description}"\n{_GENERATION_PROMPT_TAIL}'
 
     def _create_fix_prompt(
         self,
@@ -196,65 +459,141 @@ NOW GENERATE THE COMPLETE PROJECT.
     ) -> str:
         """Create prompt for fixing code"""
 
-        return f"""
-You are debugging a failed project.
-
-{previous_context if previous_context else ""}
-
-Original Request: "{description}"
-
-Error:
-{error}
-
-Fix ALL issues and return the COMPLETE corrected project
-using the EXACT same multi-file format.
-Ensure it runs without errors.
-"""
+        return (
+            f'{_FIX_PROMPT_HEAD}{previous_context or ""}\n\n'
+            f'Original Request: "{description}"\n\n'
+            f'Error:\n{error}\n{_FIX_PROMPT_TAIL}'
+        )
 
     # ============================================================
     # PARSING + DETECTION (UNCHANGED FROM YOUR ORIGINAL)
     # ============================================================
 
     def _parse_multi_file_output(self, output: str) -> Dict[str, Any]:
+        """
+        Parse the FILES: section of a complete response.
+
+        Only the `--- path ---` header lines are matched; each file's content
+        is sliced between successive headers, so no pattern has to scan
+        lazily across file bodies.
+        """
         files = {}
-        structure = {}
-        main_file = None
 
-        files_match = re.search(
-            r'FILES:(.*?)(?:STRUCTURE:|SETUP:|RUN:|$)',
-            output,
-            re.DOTALL | re.IGNORECASE
+        _, sentinel, tail = output.partition('FILES:')
+        if not sentinel:
+            # The model occasionally changes the sentinel's case
+            index = output.upper().find('FILES:')
+            if index == -1:
+                return self._build_parse_result(files)
+            tail = output[index + len('FILES:'):]
+
+        newline = tail.find('\n')
+        if newline == -1:
+            return self._build_parse_result(files)
+        start = newline + 1
+        end = min(
+            (i for i in (tail.find('\n' + marker, newline) for marker in _SECTION_END_MARKERS)
+             if i != -1),
+            default=len(tail)
         )
 
-        if not files_match:
-            return {"files": {}, "structure": {}, "main_file": None}
+        headers = [
+            m for m in _FILE_HEADER_RE.finditer(tail, start, end)
+            if m.group(1).strip('-')
+        ]
+        for i, match in enumerate(headers):
+            content_end = headers[i + 1].start() if i + 1 < len(headers) else end
+            filepath = sys.intern(match.group(1).strip().replace('\\', '/'))
+            files[filepath] = tail[match.end():content_end].strip()
 
-        files_section = files_match.group(1)
+        return self._build_parse_result(files)
 
-        file_pattern = r'---\s*([^\n]+?)\s*---\n(.*?)(?=---|\Z)'
-        matches = re.findall(file_pattern, files_section, re.DOTALL)
+    def _build_parse_result(self, files: Dict[str, str]) -> Dict[str, Any]:
+        """Pick the entry point for parsed files"""
+        main_file = None
 
-        for filepath, content in matches:
-            filepath = filepath.strip().replace('\\', '/')
-            content = content.strip()
-            files[filepath] = content
+        if not files:
+            return {"files": {}, "structure": None, "main_file": None}
 
-            if main_file is None:
-                if any(name in filepath.lower()
-                       for name in ['app.py', 'main.py', 'index.js', 'app.js', 'server.js']):
-                    main_file = filepath
+        for filepath in files:
+            lower = filepath.lower()
+            if any(name in lower for name in _MAIN_CANDIDATES):
+                main_file = filepath
+                break
 
         if main_file is None and files:
-            main_file = list(files.keys())[0]
-
-        structure = self._build_file_tree(list(files.keys()))
+            main_file = next(iter(files))
 
         return {
             "files": files,
-            "structure": structure,
+            # Built on demand with _build_file_tree once a run succeeds
+            "structure": None,
             "main_file": main_file
         }
 
+    async def _stream_generation(
+        self,
+        prompt: str,
+        message_callback: Callable
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Stream the Gemini response, parsing files incrementally and
+        notifying the caller as each one completes.
+        """
+        parser = _MultiFileStreamParser()
+        chunks = []
+
+        response = await self.model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. the final finish chunk)
+                continue
+            chunks.append(text)
+            await self._notify_files(message_callback, parser.feed(text))
+
+        await self._notify_files(message_callback, parser.close())
+
+        code_output = "".join(chunks).strip()
+        return code_output, self._build_parse_result(parser.files)
+
+    async def _notify_files(self, message_callback: Callable, filepaths: List[str]):
+        """Send a "file_ready" update for each completed file"""
+        for filepath in filepaths:
+            await message_callback({
+                "type": "file_ready",
+                "message": f"📄 Generated {filepath}",
+                "path": filepath
+            })
+
+    def _pick_candidate(self, response) -> Tuple[str, Dict[str, Any]]:
+        """
+        Return (text, parse_result) for the first candidate that parses into
+        files, falling back to the first non-empty candidate.
+        """
+        fallback = None
+        candidates = response.candidates
+
+        for index, candidate in enumerate(candidates):
+            parts = getattr(candidate.content, 'parts', None) or []
+            text = "".join(getattr(part, 'text', '') for part in parts).strip()
+            if not text:
+                continue
+
+            parse_result = self._parse_multi_file_output(text)
+            if parse_result["files"]:
+                logger.info(f"🧪 Using candidate {index + 1}/{len(candidates)}")
+                return text, parse_result
+
+            if fallback is None:
+                fallback = (text, parse_result)
+
+        if fallback is None:
+            raise ValueError("Gemini returned no usable candidates")
+
+        return fallback
+
     def _build_file_tree(self, filepaths: List[str]) -> Dict:
         tree = {}
         for filepath in filepaths:
@@ -270,64 +609,25 @@ Ensure it runs without errors.
         return tree
 
     def _detect_project_config(self, files: Dict[str, str]) -> Dict[str, Any]:
-        filenames = set(files.keys())
-
-        if 'package.json' in filenames:
-            package_json = files['package.json'].lower()
-
-            if 'react' in package_json:
-                return {
-                    "project_type": "react",
-                    "language": "javascript",
-                    "is_server": True,
-                    "start_command": "npm start",
-                    "install_command": "npm install",
-                    "port": 5555,
-                    "dependencies": ["react", "react-dom"]
-                }
-
-            if 'express' in package_json:
-                return {
-                    "project_type": "express",
-                    "language": "javascript",
-                    "is_server": True,
-                    "start_command": "node index.js",
-                    "install_command": "npm install",
-                    "port": 5555,
-                    "dependencies": ["express"]
-                }
-
-        if any('flask' in files[f].lower() for f in files):
-            return {
-                "project_type": "flask",
-                "language": "python",
-                "is_server": True,
-                "start_command": "python app.py",
-                "install_command": "pip install -r requirements.txt",
-                "port": 5000,
-                "dependencies": ["flask"]
-            }
-
-        if any('fastapi' in files[f].lower() for f in files):
-            return {
-                "project_type": "fastapi",
-                "language": "python",
-                "is_server": True,
-                "start_command": "uvicorn main:app --port 8100",
-                "install_command": "pip install -r requirements.txt",
-                "port": 8100,
-                "dependencies": ["fastapi", "uvicorn"]
-            }
-
-        return {
-            "project_type": "unknown",
-            "language": "unknown",
-            "is_server": False,
-            "start_command": None,
-            "install_command": None,
-            "port": None,
-            "dependencies": []
-        }
+        # Only the dependency manifests are read; source files and assets
+        # can mention framework names without using them
+        config_items = []
+        has_python_manifest = False
+        for path, content in files.items():
+            name = path.rsplit('/', 1)[-1]
+            if name in _CONFIG_FILES:
+                config_items.append((name, content))
+                has_python_manifest = has_python_manifest or name in _PYTHON_MANIFESTS
+
+        if not has_python_manifest:
+            config_items.extend(
+                (path, content) for path, content in files.items()
+                if path.endswith('.py')
+            )
+
+        config = _detect_project_config_cached(tuple(sorted(config_items)))
+        # Callers get their own copy; the cached entry is shared
+        return {**config, "dependencies": list(config["dependencies"])}
 
     def _handle_single_file(self, code_output: str, description: str) -> Dict[str, Any]:
         language = "python"
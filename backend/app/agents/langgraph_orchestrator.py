@@ -10,7 +10,7 @@ from loguru import logger
 
 from langgraph.graph import StateGraph, END
 
-from app.agents.router_agent import router_agent
+from app.agents.router_agent import get_router_agent
 from app.services.context_builder import context_builder
 from app.services.enhanced_memory_service import enhanced_memory_service
 from app.core.llm import llm_adapter
@@ -191,7 +191,7 @@ class LangGraphOrchestrator:
         
         try:
             # Classify with user context + conversation history
-            result = router_agent.classify_task(
+            result = await get_router_agent().classify_task(
                 user_message=state['user_message'],
                 user_context=state.get('user_context', ''),
                 conversation_history=state.get('conversation_history', [])
@@ -260,7 +260,8 @@ class LangGraphOrchestrator:
                 conversation_history=history_dicts,
                 iteration=state.get('iteration', 1),
                 previous_error=state.get('errors', [])[-1] if state.get('errors') else None,
-                context=state.get('user_context', '')
+                context=state.get('user_context', ''),
+                message_callback=state.get('metadata', {}).get('_message_callback')
             )
             
             # Extract results
@@ -291,6 +292,9 @@ class LangGraphOrchestrator:
                     server_url = sandbox_result.get('server_url', '')
                     server_running = sandbox_result.get('server_started', False)
                     
+                    if sandbox_result.get('success'):
+                        code_specialist.remember_success(result)
+                    
                     # Build rich output message
                     output_parts = []
                     if result.get('raw_output'):
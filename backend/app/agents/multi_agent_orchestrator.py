@@ -5,8 +5,10 @@ Multi-Agent Orchestrator - COMPLETE FIXED VERSION
 - Memory fully integrated
 """
 
+import asyncio
 import os
 import sys
+from collections import deque
 from typing import Dict, Any, Optional, Callable
 from datetime import datetime
 from loguru import logger
@@ -15,13 +17,22 @@ import re
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from .multi_agent_state import AgentState
-from .router_agent import router_agent
+from .router_agent import get_router_agent
 from .code_specialist_agent import code_specialist
 from ..services.sandbox_services import sandbox_service
 from ..services.memory_service import memory_service
 from ..core.llm import llm_adapter
 from ..models import Message, MessageRole
 
+# Only the most recent sandbox runs (with full stdout/stderr) are kept
+_MAX_EXECUTION_RESULTS = 2
+
+# Filler words dropped when deriving a project name from the request
+_REMOVE_WORDS_RE = re.compile(
+    r'\b(?:create|build|make|a|an|the|app|application|project)\b',
+    re.IGNORECASE
+)
+
 
 class MultiAgentOrchestrator:
     """Orchestrates multiple specialist agents with FULL memory"""
@@ -55,13 +66,13 @@ class MultiAgentOrchestrator:
                 state, user_id, conversation_history, message_callback
             )
 
-    def _router_node(
+    async def _router_node(
         self,
         state: AgentState,
         user_context: str = ""
     ) -> AgentState:
         logger.info("🎯 Router: Classifying task...")
-        decision = router_agent.classify_task(
+        decision = await get_router_agent().classify_task(
             state["user_message"],
             user_context=user_context
         )
@@ -87,7 +98,7 @@ class MultiAgentOrchestrator:
         message_callback: Optional[Callable] = None
     ) -> AgentState:
         logger.info("💻 Code Specialist: Processing...")
-        state["agent_path"] += ["code_specialist"]
+        state["agent_path"].append("code_specialist")
         state["start_time"] = datetime.now().isoformat()
 
         max_iterations = state.get("max_iterations", 5)
@@ -113,16 +124,20 @@ class MultiAgentOrchestrator:
                 user_id=user_id,
                 conversation_history=conversation_history,
                 iteration=iteration,
-                previous_error=state.get("last_error")
+                previous_error=state.get("last_error"),
+                message_callback=message_callback
             )
             
             if not gen_result.get("success"):
                 state["error_message"] = gen_result.get("error", "Code generation failed")
                 break
 
+            # Only the parsed files are used from here on; don't keep the
+            # full model text alive across execution and later iterations
+            gen_result.pop("raw_output", None)
+
             # Update state
             state["files"] = gen_result["files"]
-            state["project_structure"] = gen_result["structure"]
             state["main_file"] = gen_result["main_file"]
             state["project_type"] = gen_result["project_type"]
             state["language"] = gen_result["language"]
@@ -134,6 +149,9 @@ class MultiAgentOrchestrator:
             # Execute code
             exec_result = await self._execute_code(state, project_name)
             
+            if len(state["execution_results"]) == state["execution_results"].maxlen:
+                dropped = state["execution_results"][0]
+                logger.debug(f"🗑️ Dropping execution result from iteration {dropped['iteration']}")
             state["execution_results"].append({
                 "iteration": iteration,
                 "success": exec_result.get("success", False),
@@ -148,16 +166,20 @@ class MultiAgentOrchestrator:
             # Check success
             if exec_result.get("success"):
                 final_success = True
+                code_specialist.remember_success(gen_result)
+                state["project_structure"] = code_specialist._build_file_tree(list(state["files"]))
                 
-                # Learn from success!
+                # Learn from success (a blocking DB write) while the
+                # success message goes out, instead of one after the other
+                pending = []
                 if user_id:
-                    memory_service.learn_from_behavior(user_id, {
+                    pending.append(asyncio.to_thread(memory_service.learn_from_behavior, user_id, {
                         'task_type': 'coding',
                         'language': state.get('language'),
                         'framework': state.get('project_type'),
                         'project_type': state.get('project_type'),
                         'success': True
-                    })
+                    }))
                 
                 if message_callback:
                     msg = "✅ Code executed successfully!"
@@ -166,10 +188,12 @@ class MultiAgentOrchestrator:
                     if exec_result.get("project_path"):
                         msg += f"\n📁 Saved to: {exec_result['project_path']}"
                     
-                    await message_callback({
+                    pending.append(message_callback({
                         "type": "success",
                         "message": msg
-                    })
+                    }))
+                
+                await asyncio.gather(*pending)
                 break
             else:
                 state["last_error"] = exec_result.get("stderr", "Unknown error")
@@ -224,19 +248,13 @@ class MultiAgentOrchestrator:
 
     def _extract_project_name(self, user_message: str) -> str:
         """Extract project name from user message"""
-        msg = user_message.lower()
-        
-        remove_words = ['create', 'build', 'make', 'a', 'an', 'the', 'app', 'application', 'project']
-        for word in remove_words:
-            msg = msg.replace(f' {word} ', ' ')
-            msg = msg.replace(f'{word} ', '')
-            msg = msg.replace(f' {word}', '')
+        msg = _REMOVE_WORDS_RE.sub(' ', user_message)
         
         words = re.findall(r'\w+', msg)
         
         if words:
             name_parts = words[:3]
-            project_name = '-'.join(name_parts)
+            project_name = '-'.join(name_parts).lower()
             return project_name[:30]
         
         return "my-project"
@@ -305,7 +323,7 @@ class MultiAgentOrchestrator:
         Now it properly processes desktop commands.
         """
         logger.info("🖥️ Desktop Specialist: Processing...")
-        state["agent_path"] += ["desktop_specialist"]
+        state["agent_path"].append("desktop_specialist")
         state["start_time"] = datetime.now().isoformat()
 
         try:
@@ -441,7 +459,7 @@ class MultiAgentOrchestrator:
         Now: Uses full context for responses
         """
         logger.info("💬 General Assistant: Processing...")
-        state["agent_path"] += ["general_assistant"]
+        state["agent_path"].append("general_assistant")
         state["start_time"] = datetime.now().isoformat()
 
         try:
@@ -544,7 +562,7 @@ class MultiAgentOrchestrator:
             "confidence": None,
             "iteration": 1,
             "max_iterations": max_iterations,
-            "execution_results": [],
+            "execution_results": deque(maxlen=_MAX_EXECUTION_RESULTS),
             "agent_path": [],
             "language": None,
             "project_path": None,
@@ -555,7 +573,7 @@ class MultiAgentOrchestrator:
         logger.info(f"🚀 Processing: '{user_message[:50]}...'")
         
         # Route with user context
-        state = self._router_node(initial_state, user_context=user_context)
+        state = await self._router_node(initial_state, user_context=user_context)
         
         # Execute appropriate agent WITH CONTEXT
         state = await self._route_to_agent(
@@ -599,7 +617,7 @@ class MultiAgentOrchestrator:
             "server_port": state.get("server_port"),
             "metadata": {
                 "total_iterations": state.get("total_iterations", 0),
-                "execution_results": state["execution_results"],
+                "execution_results": list(state["execution_results"]),
                 "start_time": state.get("start_time"),
                 "end_time": state.get("end_time")
             },
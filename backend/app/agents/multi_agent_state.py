@@ -2,7 +2,7 @@
 Multi-Agent State Definitions - UPDATED FOR MULTI-FILE PROJECTS
 Defines the shared state across all agents
 """
-from typing import TypedDict, List, Optional, Literal, Dict
+from typing import TypedDict, Deque, List, Optional, Literal, Dict
 from datetime import datetime
 
 
@@ -35,7 +35,7 @@ class AgentState(TypedDict):
     # Execution tracking
     iteration: int
     max_iterations: int
-    execution_results: List[dict]
+    execution_results: Deque[dict]  # Bounded: last few runs only
     
     # Server info - NEW
     is_server: bool  # Is this a web server project?
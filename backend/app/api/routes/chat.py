@@ -2,7 +2,12 @@
 Chat API Routes
 Main chat endpoint and conversation management
 """
+import asyncio
+from typing import AsyncIterator
+
+import orjson
 from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
 from app.models import (
     ChatRequest, 
     ChatResponse, 
@@ -52,6 +57,100 @@ async def chat(request: ChatRequest):
         )
 
 
+def _sse(event: dict) -> bytes:
+    """Encode one Server-Sent Events frame"""
+    return b"data: " + orjson.dumps(
+        event, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z, default=str
+    ) + b"\n\n"
+
+
+async def _coalesce_deltas(events: AsyncIterator[dict]) -> AsyncIterator[dict]:
+    """
+    Merge consecutive delta events so long completions are not sent one
+    token per frame. The first delta goes out alone to keep time-to-first-
+    token; the batch size then grows up to STREAM_BATCH_SIZE, and a partial
+    batch is flushed once STREAM_FLUSH_MS has passed since it started.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    end = object()
+    
+    async def pump():
+        try:
+            async for event in events:
+                await queue.put(event)
+        except Exception as e:
+            await queue.put(e)
+        finally:
+            await queue.put(end)
+    
+    loop = asyncio.get_running_loop()
+    flush_after = settings.STREAM_FLUSH_MS / 1000
+    batch_size = 1.0
+    buffer = []
+    deadline = None
+    pump_task = asyncio.create_task(pump())
+    
+    try:
+        while True:
+            try:
+                timeout = max(deadline - loop.time(), 0) if buffer else None
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield {"type": "delta", "content": "".join(buffer)}
+                buffer.clear()
+                continue
+            
+            if isinstance(item, dict) and item["type"] == "delta":
+                if not buffer:
+                    deadline = loop.time() + flush_after
+                buffer.append(item["content"])
+                if len(buffer) >= batch_size:
+                    yield {"type": "delta", "content": "".join(buffer)}
+                    buffer.clear()
+                    batch_size = min(settings.STREAM_BATCH_SIZE, batch_size * settings.STREAM_BATCH_GROWTH)
+                continue
+            
+            if buffer:
+                yield {"type": "delta", "content": "".join(buffer)}
+                buffer.clear()
+            if item is end:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        pump_task.cancel()
+
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming chat endpoint (Server-Sent Events)
+    
+    Emits `data: {json}` frames: start, delta (response text as it is
+    generated), then done with the same fields as /chat, or error
+    """
+    logger.info(f"Received streaming chat request from user: {request.user_id}")
+    
+    async def event_stream():
+        try:
+            async for event in _coalesce_deltas(agent.stream_message(
+                user_message=request.message,
+                conversation_id=request.conversation_id,
+                user_id=request.user_id
+            )):
+                yield _sse(event)
+        except Exception as e:
+            logger.error(f"Error in chat stream: {e}")
+            yield _sse({"type": "error", "error": f"Failed to process message: {e}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/conversation/{conversation_id}")
 async def get_conversation(conversation_id: str):
     """
@@ -209,6 +308,7 @@ async def reload_skills():
     """
     try:
         count = skill_manager.reload_skills()
+        agent.invalidate_tools_cache()
         return {
             "message": f"Reloaded {count} skills",
             "count": count
@@ -6,6 +6,7 @@ from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 from loguru import logger
 from datetime import datetime, timezone
+import orjson
 
 from app.agents.langgraph_orchestrator import langgraph_orchestrator
 from app.services.enhanced_memory_service import enhanced_memory_service
@@ -14,6 +15,11 @@ from app.services.slash_command_service import slash_command_service
 router = APIRouter()
 
 
+async def _send_json(websocket: WebSocket, payload: Dict[str, Any]):
+    """Encode with orjson (datetimes serialize natively) and send as a text frame"""
+    await websocket.send_text(orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS).decode())
+
+
 class MultiAgentRequest(BaseModel):
     message: str
     conversation_id: Optional[str] = None
@@ -120,7 +126,7 @@ async def code_generation_stream(websocket: WebSocket):
                 user_id=user_id,
                 conversation_id=conversation_id
             )
-            await websocket.send_json({
+            await _send_json(websocket, {
                 "type": "complete",
                 "success": True,
                 "result": {
@@ -131,7 +137,7 @@ async def code_generation_stream(websocket: WebSocket):
                     "agent_path": ["slash_command"],
                     "metadata": result.get("metadata", {})
                 },
-                "timestamp": datetime.now(timezone.utc).isoformat()
+                "timestamp": datetime.now(timezone.utc)
             })
             return
         
@@ -141,7 +147,7 @@ async def code_generation_stream(websocket: WebSocket):
                 payload = {
                     "type": msg_data.get("type", "status"),
                     "message": msg_data.get("message", ""),
-                    "timestamp": datetime.now(timezone.utc).isoformat()
+                    "timestamp": datetime.now(timezone.utc)
                 }
                 # Forward web agent specific data
                 if msg_data.get("type", "").startswith("web_agent_"):
@@ -153,15 +159,15 @@ async def code_generation_stream(websocket: WebSocket):
                         payload["step"] = msg_data["step"]
                     if "success" in msg_data:
                         payload["success"] = msg_data["success"]
-                await websocket.send_json(payload)
+                await _send_json(websocket, payload)
             except Exception as e:
                 logger.warning(f"⚠️ Send failed: {e}")
         
         # Initial message
-        await websocket.send_json({
+        await _send_json(websocket, {
             "type": "context",
             "message": "🧠 Loading personalized context...",
-            "timestamp": datetime.now(timezone.utc).isoformat()
+            "timestamp": datetime.now(timezone.utc)
         })
         
         # Process with LangGraph
@@ -173,25 +179,28 @@ async def code_generation_stream(websocket: WebSocket):
             message_callback=send_to_frontend
         )
         
+        # The final messages go out back to back; stamp them once
+        sent_at = datetime.now(timezone.utc)
+        
         # Send classification
-        await websocket.send_json({
+        await _send_json(websocket, {
             "type": "classification",
             "task_type": result.get("task_type"),
             "confidence": result.get("confidence"),
             "message": f"📍 Task: {result.get('task_type')}",
-            "timestamp": datetime.now(timezone.utc).isoformat()
+            "timestamp": sent_at
         })
         
         # Send agent path
         if result.get("agent_path"):
-            await websocket.send_json({
+            await _send_json(websocket, {
                 "type": "agents",
                 "message": f"🤖 Agents: {' → '.join(result['agent_path'])}",
-                "timestamp": datetime.now(timezone.utc).isoformat()
+                "timestamp": sent_at
             })
         
         # Send completion
-        await websocket.send_json({
+        await _send_json(websocket, {
             "type": "complete",
             "success": result.get("success"),
             "result": {
@@ -212,7 +221,7 @@ async def code_generation_stream(websocket: WebSocket):
                 "web_current_url": result.get("metadata", {}).get("web_current_url", ""),
                 "web_autonomous": result.get("metadata", {}).get("web_autonomous", False),
             },
-            "timestamp": datetime.now(timezone.utc).isoformat()
+            "timestamp": sent_at
         })
     
     except WebSocketDisconnect:
@@ -220,10 +229,10 @@ async def code_generation_stream(websocket: WebSocket):
     except Exception as e:
         logger.error(f"❌ WebSocket error: {e}")
         try:
-            await websocket.send_json({
+            await _send_json(websocket, {
                 "type": "error",
                 "message": f"Error: {str(e)}",
-                "timestamp": datetime.now(timezone.utc).isoformat()
+                "timestamp": datetime.now(timezone.utc)
             })
         except:
             pass
@@ -1,8 +1,20 @@
 """
 Configuration management for SonarBot
 """
+from functools import lru_cache
+from pathlib import Path
+
+from pydantic import Field
 from pydantic_settings import BaseSettings
-from typing import Optional
+
+
+_PROMPTS_DIR = Path(__file__).parent / "prompts"
+
+
+@lru_cache(maxsize=1)
+def system_prompt() -> str:
+    """Default system prompt, read from disk on first use"""
+    return (_PROMPTS_DIR / "system_prompt.txt").read_text(encoding="utf-8")
 
 
 class Settings(BaseSettings):
@@ -18,16 +30,31 @@ class Settings(BaseSettings):
     PORT: int = 8000
     
     # CORS
-    CORS_ORIGINS: list = ["http://localhost:3000", "http://localhost:5173"]
+    CORS_ORIGINS: tuple[str, ...] = ("http://localhost:3000", "http://localhost:5173")
     
     # Groq API
     GROQ_API_KEY: str
     GROQ_MODEL: str = "llama-3.3-70b-versatile"
     GROQ_MAX_TOKENS: int = 2048
     GROQ_TEMPERATURE: float = 0.7
+    GROQ_POOL_SIZE: int = 100  # max concurrent HTTP/2 connections to api.groq.com
     
     # Agent Settings
     MAX_CONVERSATION_HISTORY: int = 10
+    MAX_PARALLEL_TOOLS: int = 4
+    
+    # Streaming: deltas per SSE frame grow from 1 by STREAM_BATCH_GROWTH up to
+    # STREAM_BATCH_SIZE; a partial frame is flushed after STREAM_FLUSH_MS
+    STREAM_BATCH_SIZE: int = 16
+    STREAM_BATCH_GROWTH: float = 3.0
+    STREAM_FLUSH_MS: int = 50
+    
+    # Router semantic cache (cosine similarity needed to reuse a classification)
+    CACHE_SIMILARITY_THRESHOLD: float = 0.92
+    
+    # Router draft model (verified by gemini-2.5-flash when unsure)
+    ROUTER_USE_DRAFT_MODEL: bool = True
+    ROUTER_DRAFT_MODEL: str = "gemini-2.5-flash-lite"
     
     # Desktop Agent URL
     DESKTOP_AGENT_URL: str = "http://localhost:7777"
@@ -52,65 +79,8 @@ class Settings(BaseSettings):
     VIRTUAL_DESKTOP_MAX_SESSIONS: int = 5
     VIRTUAL_DESKTOP_RESOLUTION: str = "1280x720x24"
     
-    # System Prompt with Desktop Skills
-    SYSTEM_PROMPT: str = """You are a helpful AI assistant with access to various skills and tools, including DESKTOP AUTOMATION capabilities.
-
-**IMPORTANT: You can control the user's actual computer desktop!**
-
-Available skills:
-
-FILE MANAGEMENT:
-- file_manager: Manage files in workspace (create, read, edit, list, move, delete, search)
-
-WEB SCRAPING:
-- web_scraper: Scrape content from web pages (title, headings, text)
-- weather_checker: Get current weather for any city
-- screenshot_taker: Capture screenshots of web pages
-
-DESKTOP AUTOMATION (Real Computer Control):
-- desktop_screenshot: Capture actual desktop screenshots (not websites - your real desktop!)
-- desktop_mouse: Control mouse (move, click, drag, scroll) on actual desktop
-- desktop_keyboard: Control keyboard (type text, press keys, shortcuts) on actual desktop  
-- desktop_app_launcher: Open applications (Chrome, Task Manager, Notepad, etc.)
-- desktop_window_manager: Manage windows (list, focus, minimize, maximize, close)
-
-**CRITICAL INSTRUCTIONS FOR DESKTOP CONTROL:**
-
-When user asks to:
-- "open task manager" → Use desktop_app_launcher with app="Task Manager"
-- "open chrome" → Use desktop_app_launcher with app="chrome"
-- "open notepad" → Use desktop_app_launcher with app="notepad"
-- "take a screenshot" → Use desktop_screenshot (for actual desktop)
-- "click at 500, 300" → Use desktop_mouse with action="click"
-- "type hello world" → Use desktop_keyboard with action="type"
-- "press enter" → Use desktop_keyboard with action="press", key="enter"
-- "list open windows" → Use desktop_window_manager with action="list"
-
-**EXAMPLES:**
-
-User: "Open Task Manager"
-→ Use: desktop_app_launcher(app="Task Manager")
-
-User: "Open Chrome and type google.com"
-→ 1. Use: desktop_app_launcher(app="chrome")
-→ 2. Use: desktop_keyboard(action="type", text="google.com")
-→ 3. Use: desktop_keyboard(action="press", key="enter")
-
-User: "Take a screenshot of my desktop"
-→ Use: desktop_screenshot()
-
-User: "What's on my screen?"
-→ 1. Use: desktop_screenshot()
-→ 2. Analyze the image and describe what you see
-
-User: "Click the middle of the screen"
-→ Use: desktop_mouse(action="click", x=960, y=540)
-
-**DO NOT CONFUSE:**
-- desktop_screenshot = Real desktop (what user sees on screen)
-- screenshot_taker = Web pages (websites via browser automation)
-
-Be proactive in using desktop skills when appropriate. Always use desktop_app_launcher for opening applications."""
+    # System Prompt with Desktop Skills (defaults to app/prompts/system_prompt.txt)
+    SYSTEM_PROMPT: str = Field(default_factory=system_prompt)
     
     # Security
     SECRET_KEY: str = "your-secret-key-change-this-in-production"
@@ -118,7 +88,14 @@ Be proactive in using desktop skills when appropriate. Always use desktop_app_la
     class Config:
         env_file = ".env"
         case_sensitive = True
+        frozen = True
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Settings are read from the environment once per process"""
+    return Settings()
 
 
 # Global settings instance
-settings = Settings()
+settings = get_settings()
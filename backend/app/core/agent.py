@@ -2,11 +2,13 @@
 Agent Orchestrator
 Main agent logic that coordinates LLM and state management
 """
-import json
-from typing import Dict, Optional, List
-from app.models import Message, MessageRole
+import asyncio
+import orjson
+from typing import AsyncIterator, Dict, Optional, List, Tuple
+from app.models import MessageMeta, MessageRole
 from app.core.llm import llm_adapter
 from app.core.state import state_manager
+from app.config import settings
 from app.skills.manager import skill_manager
 from app.skills.executor import skill_executor
 from loguru import logger
@@ -17,6 +19,15 @@ class AgentOrchestrator:
     Main agent that handles requests and orchestrates components
     """
     
+    __slots__ = (
+        "llm",
+        "state",
+        "skill_manager",
+        "skill_executor",
+        "_tool_semaphore",
+        "_tools_cache",
+    )
+    
     def __init__(self):
         """Initialize agent orchestrator"""
         self.llm = llm_adapter
@@ -24,8 +35,12 @@ class AgentOrchestrator:
         self.skill_manager = skill_manager
         self.skill_executor = skill_executor
         
+        # Limit how many tool calls from one LLM turn run at once
+        self._tool_semaphore = asyncio.Semaphore(settings.MAX_PARALLEL_TOOLS)
+        
         # Load available skills
         loaded = self.skill_manager.load_skills()
+        self._tools_cache = self._build_tools()
         logger.info(f"Initialized AgentOrchestrator with {loaded} skills")
     
     async def process_message(
@@ -46,39 +61,20 @@ class AgentOrchestrator:
             Dict with response and metadata
         """
         try:
-            # Create or retrieve conversation
-            if not conversation_id:
-                conversation_id = self.state.create_conversation(user_id)
-                logger.info(f"Created new conversation: {conversation_id}")
-            else:
-                # Verify conversation exists
-                if not self.state.get_conversation(conversation_id):
-                    logger.warning(f"Conversation {conversation_id} not found, creating new")
-                    conversation_id = self.state.create_conversation(user_id)
-            
-            # Add user message to state
-            self.state.add_message(
-                conversation_id=conversation_id,
-                role=MessageRole.USER,
-                content=user_message
-            )
-            
-            # Get conversation history
-            messages = self.state.get_messages(conversation_id)
-            
-            logger.info(f"Processing message in conversation {conversation_id} with {len(messages)} messages")
+            conversation_id, messages = self._start_turn(user_message, conversation_id, user_id)
             
             # Get available tools/skills for LLM
             tools = self._get_tools_for_llm()
             
             # Generate response from LLM (may include tool calls)
-            llm_result = await self.llm.generate_response(messages, tools=tools)
+            llm_result = await self.llm.generate_response_raw(messages, tools=tools)
             
             # Check if LLM wants to use tools
-            if "tool_calls" in llm_result and llm_result["tool_calls"]:
+            tool_calls = llm_result.get("tool_calls")
+            if tool_calls:
                 # Execute tool calls and get final response
                 final_response = await self._handle_tool_calls(
-                    llm_result["tool_calls"],
+                    tool_calls,
                     messages,
                     tools,
                     conversation_id
@@ -90,54 +86,151 @@ class AgentOrchestrator:
                 response_text = llm_result["response"]
                 skill_results = []
             
-            # Add assistant response to state
-            self.state.add_message(
-                conversation_id=conversation_id,
-                role=MessageRole.ASSISTANT,
-                content=response_text,
-                metadata={
-                    "model": llm_result["model"],
-                    "tokens_used": llm_result["tokens_used"],
-                    "skills_used": [s["skill_name"] for s in skill_results] if skill_results else []
-                }
-            )
+            return self._finish_turn(conversation_id, response_text, llm_result, skill_results)
+            
+        except Exception as e:
+            logger.error(f"Error processing message: {e}")
+            raise
+    
+    async def stream_message(
+        self,
+        user_message: str,
+        conversation_id: Optional[str] = None,
+        user_id: str = "default_user"
+    ) -> AsyncIterator[Dict]:
+        """
+        Process user message and stream the response as it is generated
+        
+        Yields:
+            {"type": "start", "conversation_id"} first, then
+            {"type": "delta", "content"} text fragments, and finally
+            {"type": "done", ...} with the same fields as process_message
+        """
+        try:
+            conversation_id, messages = self._start_turn(user_message, conversation_id, user_id)
+            yield {"type": "start", "conversation_id": conversation_id}
             
-            # Return response
-            return {
-                "response": response_text,
-                "conversation_id": conversation_id,
-                "model_used": llm_result["model"],
-                "tokens_used": llm_result["tokens_used"],
-                "skills_used": skill_results
+            tools = self._get_tools_for_llm()
+            llm_result = None
+            async for event in self.llm.stream_response_raw(messages, tools=tools):
+                if event["type"] == "delta":
+                    yield event
+                else:
+                    llm_result = event["result"]
+            
+            tool_calls = llm_result.get("tool_calls")
+            if tool_calls:
+                # Tool results are summarized in a single completion
+                final_response = await self._handle_tool_calls(
+                    tool_calls,
+                    messages,
+                    tools,
+                    conversation_id
+                )
+                response_text = final_response["response"]
+                skill_results = final_response.get("skill_results", [])
+                yield {"type": "delta", "content": response_text}
+            else:
+                response_text = llm_result["response"]
+                skill_results = []
+            
+            yield {
+                "type": "done",
+                **self._finish_turn(conversation_id, response_text, llm_result, skill_results)
             }
             
         except Exception as e:
-            logger.error(f"Error processing message: {str(e)}")
+            logger.error(f"Error streaming message: {e}")
             raise
     
-    def _get_tools_for_llm(self) -> List[Dict]:
+    def _start_turn(
+        self,
+        user_message: str,
+        conversation_id: Optional[str],
+        user_id: str
+    ) -> Tuple[str, List[Dict[str, str]]]:
+        """
+        Resolve the conversation, record the user message and
+        return the history tail to send to the LLM, already formatted
+        """
+        # Create or retrieve conversation
+        if not conversation_id or self.state.get_conversation(conversation_id) is None:
+            if conversation_id:
+                logger.warning(f"Conversation {conversation_id} not found, creating new")
+            conversation_id = self.state.create_conversation(user_id)
+            logger.info(f"Created new conversation: {conversation_id}")
+        
+        # Add user message to state
+        self.state.add_message(
+            conversation_id=conversation_id,
+            role=MessageRole.USER,
+            content=user_message
+        )
+        
+        # Get conversation history (only the tail is sent to the LLM);
+        # the state manager keeps it formatted as messages are added
+        messages = self.state.recent_formatted(
+            conversation_id,
+            limit=settings.MAX_CONVERSATION_HISTORY
+        )
+        
+        logger.opt(lazy=True).info(
+            "Processing message in conversation {} with {} messages",
+            lambda: conversation_id, lambda: len(messages)
+        )
+        return conversation_id, messages
+    
+    def _finish_turn(
+        self,
+        conversation_id: str,
+        response_text: str,
+        llm_result: Dict,
+        skill_results: List[Dict]
+    ) -> Dict:
+        """Record the assistant response and build the result dict"""
+        self.state.add_message(
+            conversation_id=conversation_id,
+            role=MessageRole.ASSISTANT,
+            content=response_text,
+            metadata=MessageMeta(
+                llm_result["model"],
+                llm_result["tokens_used"],
+                tuple(s["skill_name"] for s in skill_results)
+            )
+        )
+        
+        return {
+            "response": response_text,
+            "conversation_id": conversation_id,
+            "model_used": llm_result["model"],
+            "tokens_used": llm_result["tokens_used"],
+            "skills_used": skill_results
+        }
+    
+    def _get_tools_for_llm(self) -> Tuple[Dict, ...]:
         """
         Get skill definitions formatted for LLM tool calling
         
         Returns:
-            List of tool definitions
+            Tuple of tool definitions (built once, see invalidate_tools_cache)
         """
-        skills = self.skill_manager.get_skills_for_llm()
-        
-        # Convert to Groq tool format
-        tools = []
-        for skill in skills:
-            tools.append({
-                "type": "function",
-                "function": skill
-            })
-        
-        return tools
+        return self._tools_cache
+    
+    def _build_tools(self) -> Tuple[Dict, ...]:
+        """Convert loaded skills to Groq tool format"""
+        return tuple(
+            {"type": "function", "function": skill}
+            for skill in self.skill_manager.get_skills_for_llm()
+        )
+    
+    def invalidate_tools_cache(self):
+        """Rebuild the tool definitions after skills are reloaded"""
+        self._tools_cache = self._build_tools()
     
     async def _handle_tool_calls(
         self,
         tool_calls: List[Dict],
-        conversation_history: List[Message],
+        conversation_history: List[Dict[str, str]],
         tools: List[Dict],
         conversation_id: str
     ) -> Dict:
@@ -146,88 +239,119 @@ class AgentOrchestrator:
         
         Args:
             tool_calls: List of tool calls from LLM
-            conversation_history: Current conversation
+            conversation_history: Current conversation, formatted for the LLM
             tools: Available tools
             conversation_id: Conversation ID
             
         Returns:
             Dict with final response and skill results
         """
-        skill_results = []
+        # Execute all tool calls concurrently (bounded by MAX_PARALLEL_TOOLS);
+        # failures are captured per call so siblings keep running
+        outcomes = await asyncio.gather(
+            *(self._execute_tool_call(tool_call) for tool_call in tool_calls)
+        )
+        skill_results = [skill_result for skill_result, _ in outcomes]
+        
+        # Single follow-up completion with every tool result appended
+        messages_with_tool = list(conversation_history)
+        messages_with_tool.append({
+            "role": "assistant",
+            "content": "",
+            "tool_calls": [{
+                "id": tool_call["id"],
+                "type": tool_call["type"],
+                "function": tool_call["function"]
+            } for tool_call in tool_calls]
+        })
+        messages_with_tool.extend(tool_message for _, tool_message in outcomes)
+        
+        try:
+            # Get LLM's interpretation/summary
+            final_response = await self.llm.generate_response_raw(
+                messages_with_tool,
+                tools=None  # Don't allow recursive tool calls for now
+            )
+        except Exception as e:
+            skill_names = ", ".join(result["skill_name"] for result in skill_results)
+            logger.error(f"Error summarizing skills {skill_names}: {e}")
+            final_response = {
+                "response": f"I encountered an error while using the {skill_names} skill: {str(e)}"
+            }
+        
+        return {
+            "response": final_response.get("response", ""),
+            "skill_results": skill_results
+        }
+    
+    async def _execute_tool_call(self, tool_call: Dict) -> Tuple[Dict, Dict]:
+        """
+        Execute a single tool call
+        
+        Returns:
+            (skill result, tool message for the LLM)
+        """
+        function = tool_call["function"]
+        skill_name, raw_arguments = function["name"], function["arguments"] or "{}"
         
-        # Execute each tool call
-        for tool_call in tool_calls:
-            skill_name = tool_call["function"]["name"]
+        # Arguments are normally parsed by the LLM adapter already.
+        # Malformed arguments are a routine LLM glitch: report them back
+        # to the model instead of going through the generic error path
+        try:
+            arguments = tool_call["arguments_parsed"] if "arguments_parsed" in tool_call else orjson.loads(raw_arguments)
+        except orjson.JSONDecodeError as e:
+            logger.warning(f"⚠️ Invalid arguments for skill {skill_name}: {e}")
+            error = f"Invalid JSON arguments: {e}"
+            skill_result = {
+                "skill_name": skill_name,
+                "success": False,
+                "output": None,
+                "error": error
+            }
+            return skill_result, {
+                "role": "tool",
+                "tool_call_id": tool_call["id"],
+                "content": f"Error: {error}"
+            }
+        
+        try:
+            # Arguments can be large; only format them if INFO is enabled
+            logger.opt(lazy=True).info(
+                "Executing skill: {} with args: {}",
+                lambda: skill_name, lambda: arguments
+            )
             
-            try:
-                # Parse arguments
-                arguments = json.loads(tool_call["function"]["arguments"])
-                
-                logger.info(f"Executing skill: {skill_name} with args: {arguments}")
-                
-                # Execute skill
+            # Execute skill
+            async with self._tool_semaphore:
                 result = await self.skill_executor.execute_skill(
                     skill_name=skill_name,
                     parameters=arguments
                 )
-                
-                skill_results.append({
-                    "skill_name": skill_name,
-                    "success": result.success,
-                    "output": result.output,
-                    "error": result.error
-                })
-                
-                # Add tool result to conversation
-                tool_message = {
-                    "role": "tool",
-                    "tool_call_id": tool_call["id"],
-                    "content": json.dumps(result.output) if result.success else result.error
-                }
-                
-                # Get final response from LLM with tool results
-                messages_with_tool = self.llm._format_messages(conversation_history)
-                
-                # Add assistant message with tool call
-                messages_with_tool.append({
-                    "role": "assistant",
-                    "content": "",
-                    "tool_calls": [{
-                        "id": tool_call["id"],
-                        "type": "function",
-                        "function": {
-                            "name": skill_name,
-                            "arguments": tool_call["function"]["arguments"]
-                        }
-                    }]
-                })
-                
-                # Add tool response
-                messages_with_tool.append(tool_message)
-                
-                # Get LLM's interpretation/summary
-                final_response = await self.llm.generate_response(
-                    [Message(role=MessageRole.USER, content=m["content"]) 
-                     for m in messages_with_tool if m.get("role") != "tool"],
-                    tools=None  # Don't allow recursive tool calls for now
-                )
-                
-            except Exception as e:
-                logger.error(f"Error executing skill {skill_name}: {str(e)}")
-                skill_results.append({
-                    "skill_name": skill_name,
-                    "success": False,
-                    "output": None,
-                    "error": str(e)
-                })
-                final_response = {
-                    "response": f"I encountered an error while using the {skill_name} skill: {str(e)}"
-                }
+            success, output, error = result.success, result.output, result.error
+            skill_result = {
+                "skill_name": skill_name,
+                "success": success,
+                "output": output,
+                "error": error
+            }
+            content = orjson.dumps(output, option=orjson.OPT_NON_STR_KEYS).decode() if success else (error or "")
+            
+        except Exception as e:
+            logger.error(f"Error executing skill {skill_name}: {e}")
+            skill_result = {
+                "skill_name": skill_name,
+                "success": False,
+                "output": None,
+                "error": str(e)
+            }
+            content = f"Error: {str(e)}"
         
-        return {
-            "response": final_response.get("response", ""),
-            "skill_results": skill_results
+        tool_message = {
+            "role": "tool",
+            "tool_call_id": tool_call["id"],
+            "content": content
         }
+        return skill_result, tool_message
     
     async def get_conversation_history(
         self,
@@ -247,10 +371,11 @@ class AgentOrchestrator:
         if not conversation:
             return None
         
+        records = conversation.records
         return {
             "conversation_id": conversation.conversation_id,
             "user_id": conversation.user_id,
-            "message_count": len(conversation.messages),
+            "message_count": len(records),
             "created_at": conversation.created_at.isoformat(),
             "updated_at": conversation.updated_at.isoformat(),
             "messages": [
@@ -259,7 +384,7 @@ class AgentOrchestrator:
                     "content": msg.content,
                     "timestamp": msg.timestamp.isoformat()
                 }
-                for msg in conversation.messages
+                for msg in records
             ]
         }
     
@@ -282,8 +407,10 @@ class AgentOrchestrator:
         Returns:
             Health status dict
         """
-        groq_healthy = await self.llm.check_health()
+        # Ping the LLM providers (cached by the adapter) while collecting local stats
+        health_task = asyncio.create_task(self.llm.check_health())
         state_stats = self.state.get_stats()
+        groq_healthy = (await health_task).get("groq", False)
         
         return {
             "agent_status": "healthy",
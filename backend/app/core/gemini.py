@@ -0,0 +1,18 @@
+"""
+Gemini SDK configuration
+genai.configure() sets process-wide state, so every Gemini user goes
+through this one call instead of configuring the SDK on its own
+"""
+import os
+from functools import cache
+
+
+@cache
+def configure_genai() -> str:
+    """Configure google-generativeai once per process and return the API key"""
+    import google.generativeai as genai
+
+    api_key = os.getenv("GOOGLE_API_KEY", "")
+    if api_key:
+        genai.configure(api_key=api_key)
+    return api_key
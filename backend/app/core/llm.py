@@ -3,33 +3,51 @@ LLM Adapter with Model Failover
 Primary: Groq (fast) → Fallback: Gemini (reliable)
 Inspired by OpenClaw's model failover architecture.
 """
-import os
+import asyncio
+import io
+import time
+from contextlib import AsyncExitStack
+import httpx
+import orjson
 from groq import AsyncGroq
-from typing import List, Dict, Optional
+from typing import Any, AsyncIterator, List, Dict, Optional, Tuple
 from app.config import settings
-from app.models import Message, MessageRole
+from app.core.gemini import configure_genai
+from app.models import Message
 from loguru import logger
 
+# Seconds a health verdict is reused, so probe loops don't spend Groq quota
+_HEALTH_CACHE_TTL = 10.0
+
 
 class LLMAdapter:
     """LLM adapter with automatic failover: Groq → Gemini"""
 
     def __init__(self):
         """Initialize primary (Groq) and fallback (Gemini) clients"""
-        # Primary: Groq
-        self.groq_client = AsyncGroq(api_key=settings.GROQ_API_KEY)
+        # Primary: Groq, over one pooled HTTP/2 client so concurrent
+        # requests don't queue behind a small default pool
+        self.http_client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=settings.GROQ_POOL_SIZE,
+                max_keepalive_connections=max(settings.GROQ_POOL_SIZE // 2, 1)
+            ),
+            timeout=60.0
+        )
+        self.groq_client = AsyncGroq(api_key=settings.GROQ_API_KEY, http_client=self.http_client)
         self.groq_model = settings.GROQ_MODEL
         self.max_tokens = settings.GROQ_MAX_TOKENS
         self.temperature = settings.GROQ_TEMPERATURE
+        self._system_msg = {"role": "system", "content": settings.SYSTEM_PROMPT}
+        self._health: Optional[Tuple[Dict[str, bool], float]] = None
 
         # Fallback: Gemini (via google-generativeai)
         self._gemini_model = None
         self._gemini_available = False
         try:
             import google.generativeai as genai
-            api_key = os.getenv("GOOGLE_API_KEY", "")
-            if api_key:
-                genai.configure(api_key=api_key)
+            if configure_genai():
                 self._gemini_model = genai.GenerativeModel("gemini-2.5-flash")
                 self._gemini_available = True
                 logger.info("✅ Gemini fallback model configured")
@@ -48,13 +66,7 @@ class LLMAdapter:
         return self.groq_model
 
     def _format_messages(self, messages: List[Message]) -> List[Dict[str, str]]:
-        formatted = []
-        for msg in messages:
-            formatted.append({
-                "role": msg.role.value,
-                "content": msg.content
-            })
-        return formatted
+        return [{"role": msg._role_value, "content": msg.content} for msg in messages]
 
     async def generate_response(
         self,
@@ -64,9 +76,24 @@ class LLMAdapter:
         max_tokens: Optional[int] = None
     ) -> Dict[str, any]:
         """Generate response with automatic failover"""
+        return await self.generate_response_raw(
+            self._format_messages(messages), tools, temperature, max_tokens
+        )
+
+    async def generate_response_raw(
+        self,
+        formatted_messages: List[Dict],
+        tools: Optional[List[Dict]] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> Dict[str, any]:
+        """
+        Generate response from already formatted chat messages.
+        Roles and extra fields (tool_calls, tool_call_id) are sent as-is.
+        """
         # Try primary (Groq) first
         try:
-            result = await self._call_groq(messages, tools, temperature, max_tokens)
+            result = await self._call_groq(formatted_messages, tools, temperature, max_tokens)
             self._groq_failures = 0  # Reset on success
             return result
         except Exception as groq_err:
@@ -77,7 +104,7 @@ class LLMAdapter:
             if self._gemini_available:
                 try:
                     logger.info("🔄 Failing over to Gemini...")
-                    result = await self._call_gemini(messages, max_tokens)
+                    result = await self._call_gemini(formatted_messages, max_tokens)
                     return result
                 except Exception as gemini_err:
                     logger.error(f"❌ Gemini fallback also failed: {gemini_err}")
@@ -85,21 +112,140 @@ class LLMAdapter:
             else:
                 raise
 
-    async def _call_groq(
+    async def stream_response(
         self,
         messages: List[Message],
         tools: Optional[List[Dict]] = None,
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None
-    ) -> Dict[str, any]:
-        """Call Groq API"""
-        formatted_messages = self._format_messages(messages)
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a completion as it is generated.
+
+        Yields {"type": "delta", "content": str} events followed by one
+        {"type": "done", "result": {...}} event whose result has the same
+        shape as generate_response(), with tool calls reassembled from
+        their streamed fragments. If Groq fails before streaming starts,
+        the Gemini fallback reply is yielded as a single delta.
+        """
+        async for event in self.stream_response_raw(
+            self._format_messages(messages), tools, temperature, max_tokens
+        ):
+            yield event
+
+    async def stream_response_raw(
+        self,
+        formatted_messages: List[Dict],
+        tools: Optional[List[Dict]] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        stream_response() for already formatted chat messages.
+        The SSE body is read line by line and decoded with orjson into
+        plain dicts, skipping the SDK's per-chunk model objects.
+        """
+        parts: List[str] = []
+        # Streamed tool-call fragments keyed by index; arguments grow token
+        # by token, so they are written to a buffer instead of concatenated
+        tool_bufs: Dict[int, Dict[str, Any]] = {}
+        finish_reason = None
+        tokens_used = None
+
+        async with AsyncExitStack() as stack:
+            try:
+                response = await stack.enter_async_context(
+                    self.groq_client.chat.completions.with_streaming_response.create(
+                        **self._groq_params(formatted_messages, tools, temperature, max_tokens, stream=True)
+                    )
+                )
+            except Exception as groq_err:
+                self._groq_failures += 1
+                logger.warning(f"⚠️ Groq stream failed ({self._groq_failures}x): {groq_err}")
+                if not self._gemini_available:
+                    raise
+                try:
+                    logger.info("🔄 Failing over to Gemini...")
+                    result = await self._call_gemini(formatted_messages, max_tokens)
+                except Exception as gemini_err:
+                    logger.error(f"❌ Gemini fallback also failed: {gemini_err}")
+                    raise groq_err
+                yield {"type": "delta", "content": result["response"]}
+                yield {"type": "done", "result": result}
+                return
+
+            async for line in response.iter_lines():
+                if not line.startswith("data: "):
+                    continue
+                data = line[6:]
+                if data == "[DONE]":
+                    break
+
+                chunk = orjson.loads(data)
+                if "error" in chunk:
+                    raise RuntimeError(f"Groq stream error: {chunk['error']}")
+                usage = (chunk.get("x_groq") or {}).get("usage")
+                if usage:
+                    tokens_used = usage.get("total_tokens")
+                choices = chunk.get("choices")
+                if not choices:
+                    continue
+
+                choice = choices[0]
+                delta = choice.get("delta") or {}
+                content = delta.get("content")
+                if content:
+                    parts.append(content)
+                    yield {"type": "delta", "content": content}
+
+                for fragment in delta.get("tool_calls") or ():
+                    index = fragment.get("index", 0)
+                    buf = tool_bufs.get(index)
+                    if buf is None:
+                        buf = tool_bufs[index] = {"id": None, "name": "", "args": io.StringIO()}
+                    if fragment.get("id"):
+                        buf["id"] = fragment["id"]
+                    function = fragment.get("function")
+                    if function:
+                        if function.get("name"):
+                            buf["name"] = function["name"]
+                        if function.get("arguments"):
+                            buf["args"].write(function["arguments"])
+
+                if choice.get("finish_reason"):
+                    finish_reason = choice["finish_reason"]
 
-        if not any(msg["role"] == "system" for msg in formatted_messages):
-            formatted_messages.insert(0, {
-                "role": "system",
-                "content": settings.SYSTEM_PROMPT
-            })
+        self._groq_failures = 0
+        result = {
+            "model": self.groq_model,
+            "provider": "groq",
+            "tokens_used": tokens_used,
+            "finish_reason": finish_reason,
+            "response": "".join(parts)
+        }
+        if tool_bufs:
+            result["tool_calls"] = [
+                self._tool_call(buf["id"], "function", buf["name"], buf["args"].getvalue())
+                for _, buf in sorted(tool_bufs.items())
+            ]
+            logger.info("LLM requested {} tool calls (streamed)", len(tool_bufs))
+        else:
+            logger.info("Groq response streamed: {} tokens used", tokens_used)
+
+        yield {"type": "done", "result": result}
+
+    def _groq_params(
+        self,
+        formatted_messages: List[Dict],
+        tools: Optional[List[Dict]] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        stream: bool = False
+    ) -> Dict[str, Any]:
+        """Build chat.completions.create() arguments"""
+        # History keeps system messages first, so only the head is checked
+        if not formatted_messages or formatted_messages[0]["role"] != "system":
+            formatted_messages = [self._system_msg, *formatted_messages]
 
         api_params = {
             "model": self.groq_model,
@@ -107,14 +253,26 @@ class LLMAdapter:
             "temperature": temperature or self.temperature,
             "max_tokens": max_tokens or self.max_tokens,
             "top_p": 1,
-            "stream": False
+            "stream": stream
         }
 
         if tools:
             api_params["tools"] = tools
             api_params["tool_choice"] = "auto"
 
-        response = await self.groq_client.chat.completions.create(**api_params)
+        return api_params
+
+    async def _call_groq(
+        self,
+        formatted_messages: List[Dict],
+        tools: Optional[List[Dict]] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> Dict[str, any]:
+        """Call Groq API"""
+        response = await self.groq_client.chat.completions.create(
+            **self._groq_params(formatted_messages, tools, temperature, max_tokens)
+        )
         choice = response.choices[0]
         tokens_used = response.usage.total_tokens if response.usage else None
 
@@ -126,37 +284,51 @@ class LLMAdapter:
         }
 
         if choice.finish_reason == "tool_calls" and choice.message.tool_calls:
-            result["tool_calls"] = []
-            for tool_call in choice.message.tool_calls:
-                result["tool_calls"].append({
-                    "id": tool_call.id,
-                    "type": tool_call.type,
-                    "function": {
-                        "name": tool_call.function.name,
-                        "arguments": tool_call.function.arguments
-                    }
-                })
+            result["tool_calls"] = [
+                self._tool_call(
+                    tool_call.id, tool_call.type,
+                    tool_call.function.name, tool_call.function.arguments
+                )
+                for tool_call in choice.message.tool_calls
+            ]
             result["response"] = choice.message.content or ""
-            logger.info(f"LLM requested {len(result['tool_calls'])} tool calls")
+            logger.info("LLM requested {} tool calls", len(result["tool_calls"]))
         else:
             result["response"] = choice.message.content
-            logger.info(f"Groq response generated: {tokens_used} tokens used")
+            logger.info("Groq response generated: {} tokens used", tokens_used)
 
         return result
 
+    @staticmethod
+    def _tool_call(call_id: str, call_type: str, name: str, arguments: str) -> Dict[str, Any]:
+        """
+        Tool call dict in API shape, plus "arguments_parsed" when the
+        arguments are valid JSON so callers don't parse them again
+        """
+        tool_call = {
+            "id": call_id,
+            "type": call_type,
+            "function": {"name": name, "arguments": arguments}
+        }
+        try:
+            tool_call["arguments_parsed"] = orjson.loads(arguments) if arguments else {}
+        except orjson.JSONDecodeError:
+            pass  # left to the caller to report
+        return tool_call
+
     async def _call_gemini(
         self,
-        messages: List[Message],
+        formatted_messages: List[Dict],
         max_tokens: Optional[int] = None
     ) -> Dict[str, any]:
         """Call Gemini as fallback (sync wrapper)"""
-        import asyncio
-
         # Build a single prompt from messages
         parts = []
-        for msg in messages:
-            prefix = {"system": "System", "user": "User", "assistant": "Assistant"}.get(msg.role.value, "User")
-            parts.append(f"{prefix}: {msg.content}")
+        for msg in formatted_messages:
+            if not msg.get("content"):
+                continue
+            prefix = {"system": "System", "user": "User", "assistant": "Assistant", "tool": "Tool"}.get(msg["role"], "User")
+            parts.append(f"{prefix}: {msg['content']}")
         prompt = "\n\n".join(parts)
 
         # Gemini SDK is synchronous, run in thread
@@ -166,7 +338,7 @@ class LLMAdapter:
         )
 
         text = response.text if response.text else ""
-        logger.info(f"Gemini fallback response generated ({len(text)} chars)")
+        logger.info("Gemini fallback response generated ({} chars)", len(text))
 
         return {
             "model": "gemini-2.5-flash",
@@ -176,20 +348,28 @@ class LLMAdapter:
             "response": text
         }
 
+    async def aclose(self):
+        """Close the pooled HTTP client"""
+        await self.http_client.aclose()
+
     async def check_health(self) -> Dict[str, bool]:
-        """Check health of all LLM providers"""
+        """Check health of all LLM providers (cached for _HEALTH_CACHE_TTL)"""
+        if self._health and time.monotonic() - self._health[1] < _HEALTH_CACHE_TTL:
+            return dict(self._health[0])
+
         health = {"groq": False, "gemini": self._gemini_available}
 
         try:
             test_messages = [{"role": "user", "content": "Hello"}]
             await self.groq_client.chat.completions.create(
-                model=self.groq_model, messages=test_messages, max_tokens=5
+                model=self.groq_model, messages=test_messages, max_tokens=1
             )
             health["groq"] = True
         except Exception as e:
             logger.error(f"Groq health check failed: {e}")
 
-        return health
+        self._health = (health, time.monotonic())
+        return dict(health)
 
 
 # Global LLM adapter instance (backward compatible name)
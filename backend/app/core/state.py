@@ -3,26 +3,100 @@ Conversation State Manager
 Handles in-memory conversation history (Phase 1)
 Will be replaced with database in Phase 4
 """
-from typing import Dict, List, Optional
-from datetime import datetime
-import uuid
-from cachetools import TTLCache
-from app.models import Message, MessageRole, ConversationHistory
+from typing import Deque, Dict, List, Optional, Union
+from collections import OrderedDict, deque
+from itertools import islice
+from datetime import datetime, timezone
+import asyncio
+import time
+import secrets
+from app.models import Message, MessageMeta, MessageRecord, MessageRole, ConversationHistory
 from app.config import settings
 from loguru import logger
 
+# Conversation cache bounds: entry count, idle lifetime and approximate
+# message text held (characters of content)
+_MAX_CONVERSATIONS = 1000
+_CONVERSATION_TTL = 3600
+_MAX_CONVERSATION_BYTES = 64 * 1024 * 1024
+_SWEEP_INTERVAL = 60
+
+
+class _CacheEntry:
+    """
+    Conversation plus its expiry time, approximate size and the
+    LLM-ready {"role", "content"} dicts kept in step with its messages
+    """
+    __slots__ = ("conversation", "expires_at", "nbytes", "formatted_system", "formatted_history")
+    
+    def __init__(self, conversation: ConversationHistory, expires_at: float, nbytes: int = 0):
+        self.conversation = conversation
+        self.expires_at = expires_at
+        self.nbytes = nbytes
+        self.formatted_system: List[Dict[str, str]] = []
+        self.formatted_history: Deque[Dict[str, str]] = deque(maxlen=conversation.history.maxlen)
+
 
 class ConversationStateManager:
     """Manages conversation state in memory"""
     
     def __init__(self):
-        """Initialize state manager with TTL cache"""
-        # Cache conversations for 1 hour (3600 seconds)
-        self.conversations: TTLCache = TTLCache(
-            maxsize=1000,
-            ttl=3600
-        )
-        logger.info("Initialized ConversationStateManager with TTL cache")
+        """Initialize state manager with an LRU cache bounded by count, idle TTL and size"""
+        # Least recently used first; expired entries are dropped on access
+        # and by start_cleanup_loop()
+        self.conversations: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self.total_bytes = 0
+        logger.info("Initialized ConversationStateManager with LRU/TTL cache")
+    
+    def _get_entry(self, conversation_id: str) -> Optional[_CacheEntry]:
+        """Look up a live entry and mark it most recently used"""
+        entry = self.conversations.get(conversation_id)
+        if entry is None:
+            return None
+        
+        if entry.expires_at < time.monotonic():
+            self._drop(conversation_id)
+            return None
+        
+        self.conversations.move_to_end(conversation_id)
+        return entry
+    
+    def _drop(self, conversation_id: str) -> Optional[_CacheEntry]:
+        entry = self.conversations.pop(conversation_id, None)
+        if entry is not None:
+            self.total_bytes -= entry.nbytes
+        return entry
+    
+    def _evict(self):
+        """Drop least recently used conversations until within bounds"""
+        while len(self.conversations) > 1 and (
+            len(self.conversations) > _MAX_CONVERSATIONS
+            or self.total_bytes > _MAX_CONVERSATION_BYTES
+        ):
+            conversation_id, entry = self.conversations.popitem(last=False)
+            self.total_bytes -= entry.nbytes
+            logger.debug(f"Evicted conversation: {conversation_id}")
+    
+    def sweep_expired(self) -> int:
+        """
+        Remove all expired conversations
+        
+        Returns:
+            Number of conversations removed
+        """
+        now = time.monotonic()
+        expired = [cid for cid, entry in self.conversations.items() if entry.expires_at < now]
+        for conversation_id in expired:
+            self._drop(conversation_id)
+        return len(expired)
+    
+    async def start_cleanup_loop(self):
+        """Background task that reaps expired conversations"""
+        while True:
+            await asyncio.sleep(_SWEEP_INTERVAL)
+            removed = self.sweep_expired()
+            if removed:
+                logger.debug(f"Expired {removed} conversations")
     
     def create_conversation(self, user_id: str) -> str:
         """
@@ -34,17 +108,21 @@ class ConversationStateManager:
         Returns:
             Conversation ID
         """
-        conversation_id = f"conv_{uuid.uuid4().hex[:12]}"
+        conversation_id = f"conv_{secrets.token_hex(6)}"
+        now = datetime.now(timezone.utc)
         
         conversation = ConversationHistory(
             conversation_id=conversation_id,
             user_id=user_id,
-            messages=[],
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow()
+            history=deque(maxlen=settings.MAX_CONVERSATION_HISTORY),
+            created_at=now,
+            updated_at=now
         )
         
-        self.conversations[conversation_id] = conversation
+        self.conversations[conversation_id] = _CacheEntry(
+            conversation, time.monotonic() + _CONVERSATION_TTL
+        )
+        self._evict()
         logger.info(f"Created conversation: {conversation_id} for user: {user_id}")
         
         return conversation_id
@@ -59,14 +137,15 @@ class ConversationStateManager:
         Returns:
             ConversationHistory or None if not found
         """
-        return self.conversations.get(conversation_id)
+        entry = self._get_entry(conversation_id)
+        return entry.conversation if entry else None
     
     def add_message(
         self, 
         conversation_id: str, 
         role: MessageRole, 
         content: str,
-        metadata: Optional[Dict] = None
+        metadata: Optional[Union[MessageMeta, Dict]] = None
     ) -> bool:
         """
         Add message to conversation
@@ -80,28 +159,35 @@ class ConversationStateManager:
         Returns:
             Success boolean
         """
-        conversation = self.conversations.get(conversation_id)
+        entry = self._get_entry(conversation_id)
         
-        if not conversation:
+        if not entry:
             logger.warning(f"Conversation not found: {conversation_id}")
             return False
+        conversation = entry.conversation
+        now = datetime.now(timezone.utc)
         
-        message = Message(
-            role=role,
-            content=content,
-            timestamp=datetime.utcnow(),
-            metadata=metadata
-        )
+        message = MessageRecord(role, content, now, metadata)
         
-        conversation.messages.append(message)
-        conversation.updated_at = datetime.utcnow()
+        formatted = {"role": role.value, "content": content}
+        nbytes = entry.nbytes + len(content)
+        if role is MessageRole.SYSTEM:
+            conversation.system_messages.append(message)
+            entry.formatted_system.append(formatted)
+        else:
+            # Bounded deques: the oldest message drops out automatically
+            history = conversation.history
+            if len(history) == history.maxlen:
+                nbytes -= len(history[0].content)
+            history.append(message)
+            entry.formatted_history.append(formatted)
+        conversation.updated_at = now
         
-        # Keep only last N messages to manage memory
-        if len(conversation.messages) > settings.MAX_CONVERSATION_HISTORY:
-            # Keep system messages and last N messages
-            system_msgs = [m for m in conversation.messages if m.role == MessageRole.SYSTEM]
-            recent_msgs = [m for m in conversation.messages if m.role != MessageRole.SYSTEM][-settings.MAX_CONVERSATION_HISTORY:]
-            conversation.messages = system_msgs + recent_msgs
+        # Activity keeps the conversation alive for another TTL
+        entry.expires_at = time.monotonic() + _CONVERSATION_TTL
+        self.total_bytes += nbytes - entry.nbytes
+        entry.nbytes = nbytes
+        self._evict()
         
         logger.debug(f"Added {role.value} message to {conversation_id}")
         return True
@@ -121,20 +207,57 @@ class ConversationStateManager:
         Returns:
             List of messages
         """
-        conversation = self.conversations.get(conversation_id)
+        entry = self._get_entry(conversation_id)
         
-        if not conversation:
+        if not entry:
             return []
         
-        messages = conversation.messages
+        return self.recent_messages(entry.conversation, limit)
+    
+    @staticmethod
+    def recent_messages(
+        conversation: ConversationHistory,
+        limit: Optional[int] = None
+    ) -> List[Message]:
+        """
+        Get messages from an already retrieved conversation
+        
+        Args:
+            conversation: Conversation object
+            limit: Optional limit on number of non-system messages
+            
+        Returns:
+            List of messages
+        """
+        # Always include system messages
+        history = conversation.history
+        if limit and len(history) > limit:
+            history = islice(history, len(history) - limit, None)
+        
+        # Stored records become Message models only here, at the boundary
+        return [record.to_message() for record in (*conversation.system_messages, *history)]
+    
+    def recent_formatted(
+        self,
+        conversation_id: str,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Like get_messages, but returns the {"role", "content"} dicts the
+        LLM adapter sends, maintained incrementally by add_message
+        
+        The dicts are shared with the cache and must not be mutated.
+        """
+        entry = self.conversations.get(conversation_id)
+        
+        if not entry:
+            return []
         
-        if limit:
-            # Always include system messages
-            system_msgs = [m for m in messages if m.role == MessageRole.SYSTEM]
-            other_msgs = [m for m in messages if m.role != MessageRole.SYSTEM][-limit:]
-            return system_msgs + other_msgs
+        history = entry.formatted_history
+        if limit and len(history) > limit:
+            return [*entry.formatted_system, *islice(history, len(history) - limit, None)]
         
-        return messages
+        return [*entry.formatted_system, *history]
     
     def clear_conversation(self, conversation_id: str) -> bool:
         """
@@ -146,8 +269,7 @@ class ConversationStateManager:
         Returns:
             Success boolean
         """
-        if conversation_id in self.conversations:
-            del self.conversations[conversation_id]
+        if self._drop(conversation_id):
             logger.info(f"Cleared conversation: {conversation_id}")
             return True
         
@@ -162,14 +284,15 @@ class ConversationStateManager:
         """
         total_conversations = len(self.conversations)
         total_messages = sum(
-            len(conv.messages) 
-            for conv in self.conversations.values()
+            len(entry.conversation.system_messages) + len(entry.conversation.history)
+            for entry in self.conversations.values()
         )
         
         return {
             "total_conversations": total_conversations,
             "total_messages": total_messages,
-            "cache_size": self.conversations.maxsize
+            "total_bytes": self.total_bytes,
+            "cache_size": _MAX_CONVERSATIONS
         }
 
 
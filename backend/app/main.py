@@ -3,7 +3,7 @@ SonarBot - Main FastAPI Application
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 import os
 
@@ -47,6 +47,24 @@ async def lifespan(app: FastAPI):
     asyncio.create_task(virtual_desktop_service.start_cleanup_loop())
     logger.info("✅ Virtual desktop cleanup loop started")
     
+    # Reap expired conversations in the background
+    from app.core.state import state_manager
+    asyncio.create_task(state_manager.start_cleanup_loop())
+    
+    # Warm the router's Gemini connection without delaying startup
+    from app.agents.router_agent import get_router_agent
+    asyncio.create_task(get_router_agent().warm_up())
+    
+    # Open a pooled TLS connection to Groq so the first chat is warm
+    # (the ping also seeds the adapter's health cache)
+    from app.core.llm import llm_adapter
+    app.state.llm = llm_adapter
+    asyncio.create_task(llm_adapter.check_health())
+    
+    # Pre-create E2B sandboxes so code runs skip the cold start
+    from app.services.sandbox_services import sandbox_service
+    sandbox_service.start_pool()
+    
     # Create logs directory if it doesn't exist
     os.makedirs("logs", exist_ok=True)
     
@@ -57,6 +75,9 @@ async def lifespan(app: FastAPI):
     sched.shutdown()
     from app.services.telegram_bot_service import telegram_bot_service as tbot
     await tbot.stop()
+    await app.state.llm.aclose()
+    from app.services.sandbox_services import sandbox_service as sandboxes
+    await sandboxes.aclose()
     logger.info(f"Shutting down {settings.APP_NAME}")
 
 
@@ -65,6 +86,7 @@ app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
     description="AI Agent with skill/plugin system for task automation",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -100,7 +122,7 @@ async def root():
 async def global_exception_handler(request, exc):
     """Global exception handler"""
     logger.error(f"Unhandled exception: {str(exc)}")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "error": "Internal server error",
@@ -110,6 +132,7 @@ async def global_exception_handler(request, exc):
 
 
 if __name__ == "__main__":
+    import sys
     import uvicorn
     
     uvicorn.run(
@@ -117,5 +140,8 @@ if __name__ == "__main__":
         host=settings.HOST,
         port=settings.PORT,
         reload=settings.DEBUG,
+        # uvloop/httptools come with uvicorn[standard]; uvloop has no Windows build
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
         log_level="debug" if settings.DEBUG else "info"
     )
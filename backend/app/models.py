@@ -1,8 +1,10 @@
 """
 Pydantic models for request/response validation
 """
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, Field, ConfigDict, PrivateAttr, SkipValidation, computed_field
+from typing import Optional, List, Dict, Any, Deque, Tuple, Union
+from collections import deque
+from dataclasses import dataclass
 from datetime import datetime, timezone
 from enum import Enum
 
@@ -14,12 +16,46 @@ class MessageRole(str, Enum):
     SYSTEM = "system"
 
 
+@dataclass(frozen=True, slots=True)
+class MessageMeta:
+    """Metadata recorded on assistant messages"""
+    model: str
+    tokens_used: Optional[int]
+    skills_used: Tuple[str, ...] = ()
+
+
 class Message(BaseModel):
     """Single message in conversation"""
+    model_config = ConfigDict(extra="forbid")
+    
     role: MessageRole
     content: str
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-    metadata: Optional[Dict[str, Any]] = None
+    metadata: Optional[Union[MessageMeta, Dict[str, Any]]] = None
+    
+    # role.value resolved once; read on every LLM call by the formatter
+    _role_value: str = PrivateAttr()
+    
+    def model_post_init(self, __context: Any) -> None:
+        self._role_value = self.role.value
+
+
+@dataclass(slots=True)
+class MessageRecord:
+    """Stored conversation turn; converted to Message only at API boundaries"""
+    role: MessageRole
+    content: str
+    timestamp: datetime
+    metadata: Optional[Union[MessageMeta, Dict[str, Any]]] = None
+    
+    def to_message(self) -> Message:
+        # Fields were typed when the record was stored; skip revalidation
+        return Message.model_construct(
+            role=self.role,
+            content=self.content,
+            timestamp=self.timestamp,
+            metadata=self.metadata
+        )
 
 
 class ChatRequest(BaseModel):
@@ -67,9 +103,23 @@ class ConversationHistory(BaseModel):
     """Conversation history model"""
     conversation_id: str
     user_id: str
-    messages: List[Message]
     created_at: datetime
     updated_at: datetime
+    # System messages are kept apart from the (bounded) chat history;
+    # both are stored as given (the deque keeps its maxlen)
+    system_messages: SkipValidation[List[MessageRecord]] = Field(default_factory=list)
+    history: SkipValidation[Deque[MessageRecord]] = Field(default_factory=deque)
+    
+    @property
+    def records(self) -> List[MessageRecord]:
+        """Stored turns: system messages followed by the chat history, oldest first"""
+        return [*self.system_messages, *self.history]
+    
+    @computed_field
+    @property
+    def messages(self) -> List[Message]:
+        """Stored turns as Message models"""
+        return [record.to_message() for record in self.records]
 
 
 class HealthResponse(BaseModel):
@@ -2,13 +2,200 @@
 Enhanced E2B Sandbox Service - FINAL FIX
 Correct E2B URL format: https://[sandbox-id]-[port].sandbox.e2b.dev
 """
+import asyncio
+import io
+import json
 import os
+import shlex
+import tarfile
 import time
 import re
-from typing import Dict, Any, Optional, List
+from string import Template
+from typing import Callable, Dict, Any, Optional, List, Tuple
 from pathlib import Path
+import httpx
 from loguru import logger
-from e2b_code_interpreter import Sandbox
+
+_Sandbox = None
+
+
+def _sandbox_cls():
+    """Import the E2B SDK on first use, so workers without E2B never load it"""
+    global _Sandbox
+    if _Sandbox is None:
+        from e2b_code_interpreter import Sandbox
+        _Sandbox = Sandbox
+    return _Sandbox
+
+
+# Where the project archive is uploaded before extraction
+_ARCHIVE_PATH = "/tmp/project.tar.gz"
+
+# Pooled sandboxes live longer than the E2B default (300s) so they can wait
+# in the queue; one is handed out only while it has a full default lifetime left
+_POOLED_SANDBOX_TIMEOUT = 1800
+_MIN_REMAINING_LIFETIME = 300
+
+# Lifetime of a sandbox left running a server preview (the E2B default)
+_DETACHED_SANDBOX_TIMEOUT = 300
+
+# Server readiness polling: probe interval and overall budget
+_READY_POLL_INTERVAL = 0.3
+_READY_TIMEOUT = 15.0
+
+# Background server launcher; $argv and $env are JSON literals, valid as Python
+_SERVER_LAUNCHER = Template("""
+import os
+import subprocess
+process = subprocess.Popen(
+    $argv,
+    stdout=subprocess.PIPE,
+    stderr=subprocess.PIPE,
+    env={**os.environ, **$env}
+)
+print(f"$label started with PID {process.pid}")
+""")
+
+# A launch is (argv, extra environment, label)
+ServerLaunch = Tuple[List[str], Dict[str, str], str]
+
+
+def _flask_launch(start_command: str, port: int) -> ServerLaunch:
+    return ["flask", "run", "--host=0.0.0.0", f"--port={port}"], {"FLASK_APP": "app.py"}, "Flask server"
+
+
+def _fastapi_launch(start_command: str, port: int) -> ServerLaunch:
+    return ["uvicorn", "main:app", "--host", "0.0.0.0", "--port", str(port)], {}, "FastAPI server"
+
+
+def _node_launch(start_command: str, port: int) -> ServerLaunch:
+    return ["node", "server.js"], {}, "Node server"
+
+
+def _react_launch(start_command: str, port: int) -> ServerLaunch:
+    # Non-interactive dev server that doesn't try to open a browser
+    return ["npm", "start"], {"CI": "true", "BROWSER": "none"}, "React dev server"
+
+
+def _generic_launch(start_command: str, port: int) -> ServerLaunch:
+    return shlex.split(start_command), {}, "Server"
+
+
+_SERVER_LAUNCHES: Dict[str, Callable[[str, int], ServerLaunch]] = {
+    "flask": _flask_launch,
+    "fastapi": _fastapi_launch,
+    "express": _node_launch,
+    "node": _node_launch,
+    "react": _react_launch,
+}
+
+# Cleanup tasks still running after their request returned (held so they aren't GC'd)
+_pending_cleanups: set = set()
+
+
+def _cleanup_in_background(cleanup):
+    """Run sandbox cleanup off the response path"""
+    task = asyncio.create_task(cleanup)
+    _pending_cleanups.add(task)
+    task.add_done_callback(_pending_cleanups.discard)
+
+
+class SandboxPool:
+    """
+    Pre-created sandboxes waiting to be handed out.
+
+    Every acquire schedules a replacement, so the queue refills in the
+    background while the caller uses its sandbox.
+
+    Only never-leased sandboxes wait in the queue. A sandbox that ran
+    generated code is never handed to another user: once its run is over
+    it is discarded (killed), or detached if it keeps a server running.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._idle: asyncio.Queue = asyncio.Queue(maxsize=max(size, 1))
+        self._refills: set = set()
+        self._leased: Dict[str, float] = {}  # sandbox_id -> expiry of sandboxes handed out
+
+    def start(self):
+        """Fill the pool in the background (needs a running event loop)"""
+        for _ in range(self.size):
+            self._refill()
+        if self.size:
+            logger.info(f"🏊 Warming {self.size} E2B sandboxes")
+
+    def _refill(self):
+        task = asyncio.create_task(self._add_sandbox())
+        self._refills.add(task)
+        task.add_done_callback(self._refills.discard)
+
+    async def _add_sandbox(self):
+        try:
+            sandbox = await asyncio.to_thread(_sandbox_cls().create, timeout=_POOLED_SANDBOX_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not warm sandbox: {e}")
+            return
+        if not self._offer(sandbox, time.monotonic() + _POOLED_SANDBOX_TIMEOUT):
+            await self._kill(sandbox)
+
+    def _offer(self, sandbox, expires_at: float) -> bool:
+        if not self.size:
+            return False
+        try:
+            self._idle.put_nowait((sandbox, expires_at))
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def acquire(self, wait: float = 0.5):
+        """Take a warm sandbox, or create one if none arrives within `wait` seconds"""
+        while self.size:
+            try:
+                sandbox, expires_at = await asyncio.wait_for(self._idle.get(), wait)
+            except asyncio.TimeoutError:
+                break
+            self._refill()
+            if expires_at - time.monotonic() >= _MIN_REMAINING_LIFETIME:
+                self._leased[sandbox.sandbox_id] = expires_at
+                return sandbox
+            await self._kill(sandbox)
+
+        return await asyncio.to_thread(_sandbox_cls().create)
+
+    async def discard(self, sandbox):
+        """Forget a leased sandbox and kill it; it is never returned to the queue"""
+        self._leased.pop(getattr(sandbox, 'sandbox_id', None), None)
+        await self._kill(sandbox)
+
+    async def detach(self, sandbox):
+        """
+        Forget a sandbox that stays alive outside the pool (running servers),
+        cutting a pooled sandbox's lifetime back to the per-run default.
+        """
+        if self._leased.pop(getattr(sandbox, 'sandbox_id', None), None) is None:
+            return
+        try:
+            await asyncio.to_thread(sandbox.set_timeout, _DETACHED_SANDBOX_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not shorten sandbox lifetime: {e}")
+
+    async def close(self):
+        """Stop refilling and kill every idle sandbox"""
+        self.size = 0
+        await asyncio.gather(*self._refills, return_exceptions=True)
+        while not self._idle.empty():
+            sandbox, _ = self._idle.get_nowait()
+            await self._kill(sandbox)
+
+    @staticmethod
+    async def _kill(sandbox):
+        try:
+            logger.info("🗑️ Cleaning up sandbox...")
+            await asyncio.to_thread(sandbox.kill)
+            logger.info("✅ Sandbox cleaned up")
+        except Exception as cleanup_error:
+            logger.warning(f"⚠️ Cleanup warning: {cleanup_error}")
 
 
 class EnhancedSandboxService:
@@ -18,6 +205,8 @@ class EnhancedSandboxService:
         """Initialize E2B Sandbox Service"""
         self.api_key = os.getenv("E2B_API_KEY", "")
         self.workspace_path = os.getenv("WORKSPACE_PATH", "/workspace")
+        self.pool = SandboxPool(int(os.getenv("E2B_POOL_SIZE", "3")) if self.api_key else 0)
+        self._client: Optional[httpx.AsyncClient] = None
 
         if not self.api_key:
             logger.warning("⚠️ E2B_API_KEY not set")
@@ -37,15 +226,13 @@ class EnhancedSandboxService:
     ) -> Dict[str, Any]:
         """Execute complete multi-file project in E2B with correct URL format"""
 
-        # STEP 0: Always save files locally first, regardless of E2B availability
+        # STEP 0: Always save files locally, regardless of E2B availability.
+        # The write runs in a thread and overlaps with acquiring the sandbox.
         project_path = ""
-        try:
-            project_path = self._save_to_workspace(files, project_name)
-            logger.info(f"💾 Saved project to local workspace: {project_path}")
-        except Exception as save_err:
-            logger.error(f"❌ Failed to save project locally: {save_err}")
+        saving = asyncio.create_task(asyncio.to_thread(self._save_to_workspace, files, project_name))
 
         if not self.api_key:
+            project_path = await saving
             return {
                 "success": True,
                 "error": None,
@@ -56,25 +243,27 @@ class EnhancedSandboxService:
             }
 
         sandbox = None
+        is_server = port is not None and start_command is not None
+        # Only a sandbox with a server actually running outlives this call
+        server_started = False
         
         try:
-            # Create sandbox
-            logger.info("🔵 Creating E2B sandbox for project...")
-            sandbox = Sandbox.create()
+            # Take a warm sandbox from the pool (created on demand if it is empty)
+            logger.info("🔵 Acquiring E2B sandbox for project...")
+            project_path, sandbox = await asyncio.gather(saving, self.pool.acquire())
             sandbox_id = getattr(sandbox, 'sandbox_id', 'unknown')
-            logger.info(f"✅ Sandbox created: {sandbox_id}")
+            logger.info(f"✅ Sandbox ready: {sandbox_id}")
 
-            # STEP 1: Create files in E2B sandbox
+            # STEP 1: Create files in E2B sandbox (one archive, one round trip)
             logger.info(f"📁 Creating {len(files)} project files in sandbox...")
-            for filepath, content in files.items():
-                self._create_file_in_sandbox(sandbox, filepath, content)
+            await asyncio.to_thread(self._create_files_in_sandbox, sandbox, files)
             
             logger.info("✅ All files created in sandbox")
 
             # STEP 3: Install dependencies if needed
             if install_command:
                 logger.info(f"📦 Installing dependencies: {install_command}")
-                install_result = sandbox.run_code(f"!{install_command}")
+                install_result = await asyncio.to_thread(sandbox.run_code, f"!{install_command}")
                 
                 if hasattr(install_result, 'error') and install_result.error:
                     error_msg = str(install_result.error)
@@ -90,12 +279,10 @@ class EnhancedSandboxService:
                 else:
                     logger.info("✅ Dependencies installed successfully")
 
-            # STEP 4: Determine if this is a server project
-            is_server = port is not None and start_command is not None
-
+            # STEP 4: Start the server or run the script
             if is_server:
                 # Start server in background
-                return await self._start_server(
+                result = await self._start_server(
                     sandbox, 
                     start_command, 
                     port, 
@@ -103,14 +290,17 @@ class EnhancedSandboxService:
                     sandbox_id,
                     project_path
                 )
+                server_started = result.get("server_started", False)
+                return result
             else:
                 # Execute single script
-                result = await self._execute_script(sandbox, start_command or f"python {list(files.keys())[0]}")
+                result = await self._execute_script(sandbox, start_command or f"python {next(iter(files))}")
                 result["project_path"] = project_path
                 return result
 
         except Exception as e:
             logger.error(f"❌ Project execution error: {str(e)}")
+            project_path = await saving
             return {
                 "success": False,
                 "error": str(e),
@@ -121,14 +311,11 @@ class EnhancedSandboxService:
             }
         
         finally:
-            # Keep sandbox alive for servers, cleanup for scripts
-            if sandbox and not is_server:
-                try:
-                    logger.info("🗑️ Cleaning up sandbox...")
-                    sandbox.kill()
-                    logger.info("✅ Sandbox cleaned up")
-                except Exception as cleanup_error:
-                    logger.warning(f"⚠️ Cleanup warning: {cleanup_error}")
+            # Keep sandbox alive for a running server, clean up in every other case
+            if sandbox and server_started:
+                _cleanup_in_background(self.pool.detach(sandbox))
+            elif sandbox:
+                _cleanup_in_background(self.pool.discard(sandbox))
 
     def _save_to_workspace(self, files: Dict[str, str], project_name: str) -> str:
         """Save all project files to local workspace"""
@@ -146,41 +333,50 @@ class EnhancedSandboxService:
             
             project_dir.mkdir(parents=True, exist_ok=True)
             
-            # Write all files
+            # Create each parent directory once, then write all files
+            for directory in {(project_dir / filepath).parent for filepath in files}:
+                directory.mkdir(parents=True, exist_ok=True)
+            
             for filepath, content in files.items():
-                file_path = project_dir / filepath
-                file_path.parent.mkdir(parents=True, exist_ok=True)
-                file_path.write_text(content, encoding='utf-8')
+                (project_dir / filepath).write_text(content, encoding='utf-8')
                 logger.debug(f"  💾 Saved: {filepath}")
             
-            logger.info(f"✅ Saved {len(files)} files to workspace")
+            logger.info(f"✅ Saved {len(files)} files to workspace: {project_dir}")
             return str(project_dir)
         
         except Exception as e:
             logger.error(f"❌ Failed to save to workspace: {e}")
             return ""
 
-    def _create_file_in_sandbox(self, sandbox, filepath: str, content: str):
-        """Create a single file in the sandbox"""
-        
-        # Create directory structure if needed
-        if '/' in filepath:
-            directory = '/'.join(filepath.split('/')[:-1])
-            sandbox.run_code(f"!mkdir -p {directory}")
+    @staticmethod
+    def _pack_files(files: Dict[str, str]) -> bytes:
+        """Pack project files into an in-memory tar.gz archive"""
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+            for filepath, content in files.items():
+                data = content.encode('utf-8')
+                info = tarfile.TarInfo(filepath)
+                info.size = len(data)
+                info.mode = 0o644
+                archive.addfile(info, io.BytesIO(data))
+        return buffer.getvalue()
+
+    def _create_files_in_sandbox(self, sandbox, files: Dict[str, str]):
+        """Upload all project files as one archive and unpack it in the sandbox"""
         
-        # Write file content using base64 encoding to avoid escaping issues
-        import base64
-        content_b64 = base64.b64encode(content.encode('utf-8')).decode('utf-8')
+        # Raw bytes go over the filesystem API; directories come from the archive's paths
+        sandbox.files.write(_ARCHIVE_PATH, self._pack_files(files))
         
-        sandbox.run_code(f'''
-import base64
-content_b64 = "{content_b64}"
-content = base64.b64decode(content_b64).decode('utf-8')
-with open('{filepath}', 'w') as f:
-    f.write(content)
+        result = sandbox.run_code(f'''
+import os, tarfile
+with tarfile.open("{_ARCHIVE_PATH}", mode="r:gz") as archive:
+    archive.extractall()
+os.remove("{_ARCHIVE_PATH}")
 ''')
+        if hasattr(result, 'error') and result.error:
+            raise RuntimeError(f"Failed to create project files: {result.error}")
         
-        logger.debug(f"  ✅ Created: {filepath}")
+        logger.debug(f"  ✅ Created: {', '.join(files)}")
 
     async def _start_server(
         self, 
@@ -205,72 +401,12 @@ with open('{filepath}', 'w') as f:
         server_url = f"https://{sandbox_id}-{port}.sandbox.e2b.dev"
         
         # Start server in background based on project type
-        if project_type == "flask":
-            server_code = f"""
-import subprocess
-import os
-os.environ['FLASK_APP'] = 'app.py'
-process = subprocess.Popen(
-    ['flask', 'run', '--host=0.0.0.0', '--port={port}'],
-    stdout=subprocess.PIPE,
-    stderr=subprocess.PIPE
-)
-print(f"Flask server started with PID {{process.pid}}")
-"""
-        elif project_type == "fastapi":
-            server_code = f"""
-import subprocess
-process = subprocess.Popen(
-    ['uvicorn', 'main:app', '--host', '0.0.0.0', '--port', '{port}'],
-    stdout=subprocess.PIPE,
-    stderr=subprocess.PIPE
-)
-print(f"FastAPI server started with PID {{process.pid}}")
-"""
-        elif project_type in ["express", "node"]:
-            server_code = f"""
-import subprocess
-process = subprocess.Popen(
-    ['node', 'server.js'],
-    stdout=subprocess.PIPE,
-    stderr=subprocess.PIPE
-)
-print(f"Node server started with PID {{process.pid}}")
-"""
-        elif project_type == "react":
-            # React dev server - run in background
-            server_code = f"""
-import subprocess
-import os
-
-# Set environment to non-interactive
-os.environ['CI'] = 'true'
-os.environ['BROWSER'] = 'none'
-
-# Start React dev server in background
-process = subprocess.Popen(
-    ['npm', 'start'],
-    stdout=subprocess.PIPE,
-    stderr=subprocess.PIPE,
-    env=os.environ.copy()
-)
-print(f"React dev server started with PID {{process.pid}}")
-"""
-        else:
-            # Generic server start
-            server_code = f"""
-import subprocess
-process = subprocess.Popen(
-    {start_command.split()},
-    stdout=subprocess.PIPE,
-    stderr=subprocess.PIPE
-)
-print(f"Server started with PID {{process.pid}}")
-"""
+        argv, env, label = _SERVER_LAUNCHES.get(project_type, _generic_launch)(start_command, port)
+        server_code = _SERVER_LAUNCHER.substitute(argv=json.dumps(argv), env=json.dumps(env), label=label)
         
         try:
             # Start the server
-            start_result = sandbox.run_code(server_code)
+            start_result = await asyncio.to_thread(sandbox.run_code, server_code)
             
             # Check if server started
             if hasattr(start_result, 'error') and start_result.error:
@@ -285,38 +421,24 @@ print(f"Server started with PID {{process.pid}}")
                     "project_path": project_path
                 }
             
-            # Wait for server to start (longer wait for React)
-            wait_time = 10 if project_type == "react" else 5
-            logger.info(f"⏳ Waiting for server to initialize ({wait_time} seconds)...")
-            time.sleep(wait_time)
-            
-            # Test if server responds
-            check_code = f"""
-import urllib.request
-import socket
-
-try:
-    # Quick connection test
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.settimeout(2)
-    result = sock.connect_ex(('localhost', {port}))
-    sock.close()
-    
-    if result == 0:
-        print("SERVER_RUNNING")
-    else:
-        print("SERVER_NOT_RESPONDING")
-except Exception as e:
-    print(f"SERVER_CHECK_FAILED: {{e}}")
-"""
+            # Probe the public preview URL from here; the E2B edge answers 5xx until the port is open
+            logger.info(f"⏳ Waiting for server to initialize (up to {_READY_TIMEOUT:.0f} seconds)...")
             
-            check_result = sandbox.run_code(check_code)
+            client = self._get_client()
+            started = time.monotonic()
             server_running = False
             
-            if hasattr(check_result, 'text'):
-                output = check_result.text or ""
-                server_running = "SERVER_RUNNING" in output
-                logger.info(f"Server check: {output.strip()}")
+            while time.monotonic() - started < _READY_TIMEOUT:
+                try:
+                    response = await client.head(server_url, timeout=1.0)
+                    if response.status_code < 500:
+                        server_running = True
+                        break
+                except httpx.RequestError:
+                    pass
+                await asyncio.sleep(_READY_POLL_INTERVAL)
+            
+            wait_time = time.monotonic() - started
             
             if not server_running:
                 logger.warning("⚠️ Server may still be starting up (this is normal for React)...")
@@ -333,7 +455,7 @@ except Exception as e:
                 "stdout": f"Server started successfully on port {port}\n\n📁 Project saved to: {project_path}\n🌐 Live preview: {server_url}",
                 "stderr": "",
                 "exit_code": 0,
-                "execution_time": float(wait_time),
+                "execution_time": round(wait_time, 2),
                 "server_started": True,
                 "server_url": server_url,  # ✅ CORRECT FORMAT
                 "server_port": port,
@@ -361,7 +483,7 @@ except Exception as e:
         logger.info(f"🚀 Executing: {command}")
         
         try:
-            execution = sandbox.run_code(f"!{command}")
+            execution = await asyncio.to_thread(sandbox.run_code, f"!{command}")
             
             stdout = ""
             stderr = ""
@@ -408,8 +530,8 @@ except Exception as e:
             return await self.execute_project(
                 files=files,
                 project_type="python",
-                install_command=f"pip install {' '.join(packages)}" if packages else None,
-                start_command=f"python {list(files.keys())[0]}",
+                install_command=self._pip_install_command(packages) if packages else None,
+                start_command=f"python {next(iter(files))}",
                 port=None
             )
         
@@ -426,14 +548,13 @@ except Exception as e:
         
         try:
             logger.info("🔵 Creating E2B sandbox...")
-            sandbox = Sandbox.create()
+            sandbox = await asyncio.to_thread(_sandbox_cls().create)
             logger.info(f"✅ Sandbox created")
 
             if packages:
-                for pkg in packages:
-                    sandbox.run_code(f"!pip install {pkg}")
+                await asyncio.to_thread(sandbox.run_code, f"!{self._pip_install_command(packages)}")
 
-            execution = sandbox.run_code(code)
+            execution = await asyncio.to_thread(sandbox.run_code, code)
 
             stdout = ""
             stderr = ""
@@ -466,15 +587,40 @@ except Exception as e:
         
         finally:
             if sandbox:
-                try:
-                    sandbox.kill()
-                except:
-                    pass
+                _cleanup_in_background(self.pool.discard(sandbox))
+
+    @staticmethod
+    def _pip_install_command(packages: List[str]) -> str:
+        """One pip invocation for all packages; sandboxes are throwaway, so skip bytecode"""
+        names = " ".join(shlex.quote(pkg) for pkg in packages)
+        return f"pip install --no-input --prefer-binary --no-compile {names}"
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Shared keep-alive client for requests to sandbox preview URLs"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+                timeout=10.0,
+            )
+        return self._client
 
     def is_available(self) -> bool:
         """Check if E2B is configured"""
         return bool(self.api_key)
 
+    def start_pool(self):
+        """Start warming pooled sandboxes"""
+        self.pool.start()
+
+    async def aclose(self):
+        """Finish pending cleanups, kill idle pooled sandboxes and close the HTTP client"""
+        await asyncio.gather(*_pending_cleanups, return_exceptions=True)
+        await self.pool.close()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
 
 # Global instance
 sandbox_service = EnhancedSandboxService()
@@ -0,0 +1,84 @@
+"""
+Semantic Cache - Reuse results for paraphrased requests
+Messages are embedded with the shared all-MiniLM-L6-v2 model and matched
+by cosine similarity against recent entries (LRU + TTL)
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from app.services.vector_memory_service import vector_memory
+
+
+class SemanticCache:
+    """
+    Small in-process similarity cache.
+
+    Normalized embeddings live in a preallocated matrix, so a lookup is one
+    matrix-vector product over at most `maxsize` rows. Slots of evicted or
+    expired entries are zeroed and can never score above the threshold.
+
+    Every entry belongs to a scope (e.g. a digest of the context the value
+    was computed under) and only matches lookups made with the same scope.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600, threshold: float = 0.92):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+
+        self._vectors: Optional[np.ndarray] = None  # allocated on first put
+        self._scopes = np.zeros(maxsize, dtype=np.int64)
+        self._entries: "OrderedDict[int, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._free = list(range(maxsize))
+        self._lock = threading.Lock()
+
+    def embed(self, text: str) -> np.ndarray:
+        """L2-normalized embedding for text"""
+        return vector_memory.embedder.encode(
+            text, convert_to_numpy=True, normalize_embeddings=True
+        ).astype(np.float32)
+
+    def get(self, vector: np.ndarray, scope: str = "") -> Optional[Dict[str, Any]]:
+        """Return a copy of the closest live entry in scope above the threshold"""
+        with self._lock:
+            if not self._entries:
+                return None
+
+            scores = np.where(self._scopes == hash(scope), self._vectors @ vector, -1.0)
+            slot = int(np.argmax(scores))
+            if scores[slot] < self.threshold or slot not in self._entries:
+                return None
+
+            value, expires_at = self._entries[slot]
+            if expires_at < time.monotonic():
+                self._release(slot)
+                return None
+
+            self._entries.move_to_end(slot)
+            logger.debug(f"🧠 Semantic cache hit ({scores[slot]:.2f})")
+            return dict(value)
+
+    def put(self, vector: np.ndarray, value: Dict[str, Any], scope: str = ""):
+        """Store value under vector, evicting the least recently used entry if full"""
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.maxsize, vector.shape[0]), dtype=np.float32)
+
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot, _ = self._entries.popitem(last=False)
+
+            self._vectors[slot] = vector
+            self._scopes[slot] = hash(scope)
+            self._entries[slot] = (dict(value), time.monotonic() + self.ttl)
+
+    def _release(self, slot: int):
+        del self._entries[slot]
+        self._vectors[slot] = 0
+        self._free.append(slot)
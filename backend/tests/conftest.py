@@ -0,0 +1,6 @@
+"""
+Test configuration: settings need a Groq key even though no test calls Groq
+"""
+import os
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
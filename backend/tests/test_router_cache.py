@@ -0,0 +1,49 @@
+"""
+Routing caches must not share a classification between different contexts
+"""
+import asyncio
+
+import numpy as np
+
+from app.agents.router_agent import RouterAgent
+from app.services.semantic_cache import SemanticCache
+
+
+def _vector(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_semantic_cache_matches_only_within_scope():
+    cache = SemanticCache(maxsize=4, threshold=0.9)
+    cache.put(_vector(1, 0), {"task_type": "coding"}, scope="a")
+
+    assert cache.get(_vector(1, 0), scope="a") == {"task_type": "coding"}
+    assert cache.get(_vector(1, 0), scope="b") is None
+    assert cache.get(_vector(1, 0)) is None
+
+
+def test_same_message_with_different_history_is_classified_separately(monkeypatch):
+    router = RouterAgent()
+    monkeypatch.setattr(router._semantic_cache, "embed", lambda text: _vector(1, 0))
+
+    prompts = []
+
+    async def submit(prompt, message=None):
+        prompts.append(prompt)
+        task_type = "coding" if "script" in prompt else "email"
+        return f"TASK_TYPE: {task_type}\nCONFIDENCE: 0.9\nREASONING: follow-up"
+
+    monkeypatch.setattr(router._batcher, "submit", submit)
+
+    coding_history = [{"role": "user", "content": "write a python script"}]
+    email_history = [{"role": "user", "content": "draft a reply to my boss"}]
+
+    first = asyncio.run(router.classify_task("now do it again", conversation_history=coding_history))
+    second = asyncio.run(router.classify_task("now do it again", conversation_history=email_history))
+    repeat = asyncio.run(router.classify_task("now do it again", conversation_history=coding_history))
+
+    assert first["task_type"] == "coding"
+    assert second["task_type"] == "email"
+    assert repeat["task_type"] == "coding"
+    assert len(prompts) == 2
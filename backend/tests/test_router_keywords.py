@@ -0,0 +1,41 @@
+"""
+Keyword routing matches whole words, not substrings
+"""
+import pytest
+
+from app.agents.router_agent import RouterAgent
+
+
+@pytest.fixture(scope="module")
+def router():
+    return RouterAgent()
+
+
+@pytest.mark.parametrize("message", [
+    "what happens in a classic function call?",
+    "explain the approach behind this function's runtime",
+])
+def test_explanation_questions_skip_the_keyword_fast_path(router, message):
+    assert router._keyword_classification(message) is None
+
+
+def test_substrings_of_longer_words_do_not_match(router):
+    assert router._keyword_hits("i'm so happy about the latest news") == {}
+    assert router._fallback_classification("i'm so happy about the latest news")["task_type"] == "general"
+
+
+def test_whole_word_keywords_still_take_the_fast_path(router):
+    result = router._keyword_classification("write a python script")
+    assert result["task_type"] == "coding"
+    assert router._keyword_hits("go to example.com") == {"web_autonomous": 1, "website": 1}
+
+
+@pytest.mark.parametrize("message, task_type", [
+    ("check my emails", "email"),
+    ("i emailed bob yesterday, any reply?", "email"),
+    ("list my meetings", "calendar"),
+    ("what is scheduled tomorrow", "calendar"),
+    ("any reminders for today", "calendar"),
+])
+def test_inflected_keywords_still_match(router, message, task_type):
+    assert router._fallback_classification(message)["task_type"] == task_type
@@ -0,0 +1,88 @@
+"""
+Sandboxes that ran a user's project are never handed to another user
+"""
+import asyncio
+import itertools
+
+from app.services import sandbox_services
+from app.services.sandbox_services import SandboxPool
+
+
+class _FakeSandbox:
+    _ids = itertools.count()
+
+    def __init__(self, timeout=300):
+        self.sandbox_id = f"sbx-{next(self._ids)}"
+        self.files = {}
+        self.processes = []
+        self.killed = False
+
+    @classmethod
+    def create(cls, timeout=300):
+        return cls(timeout)
+
+    def kill(self):
+        self.killed = True
+
+
+def test_discarded_sandbox_state_does_not_reach_the_next_user(monkeypatch):
+    monkeypatch.setattr(sandbox_services, "_Sandbox", _FakeSandbox)
+
+    async def scenario():
+        pool = SandboxPool(size=1)
+        pool.start()
+        first = await pool.acquire(wait=1.0)
+
+        # The first user's project leaves a dotfile and a background process
+        first.files["/home/user/.env"] = "SECRET=1"
+        first.processes.append("python server.py")
+        await pool.discard(first)
+
+        second = await pool.acquire(wait=1.0)
+        await pool.close()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert first.killed
+    assert second is not first
+    assert second.files == {}
+    assert second.processes == []
+
+
+def test_server_project_that_fails_to_install_is_killed(monkeypatch, tmp_path):
+    class _Failed:
+        error = "No matching distribution"
+
+    sandboxes = []
+
+    class _RunSandbox(_FakeSandbox):
+        def __init__(self, timeout=300):
+            super().__init__(timeout)
+            sandboxes.append(self)
+
+        def run_code(self, code):
+            return _Failed()
+
+    monkeypatch.setattr(sandbox_services, "_Sandbox", _RunSandbox)
+
+    service = sandbox_services.EnhancedSandboxService()
+    service.api_key = "test-key"
+    service.workspace_path = str(tmp_path)
+    monkeypatch.setattr(service, "_create_files_in_sandbox", lambda sandbox, files: None)
+
+    async def scenario():
+        result = await service.execute_project(
+            files={"app.py": "print('hi')"},
+            project_type="flask",
+            install_command="pip install -r requirements.txt",
+            start_command="flask run",
+            port=5000
+        )
+        await asyncio.gather(*sandbox_services._pending_cleanups)
+        return result
+
+    result = asyncio.run(scenario())
+
+    assert not result["success"]
+    assert sandboxes and all(sandbox.killed for sandbox in sandboxes)